@@ -1,7 +1,7 @@
-from pyqpanda3.qcloud import QCloudService
+from qubits.cloud import get_service
 from const.constants import QUANTUM_TOKEN_API
 
-service = QCloudService(QUANTUM_TOKEN_API)
+service = get_service(QUANTUM_TOKEN_API)
 
 backends = service.backends()
 print(f'Квантовые компьютеры {backends}')
@@ -1,13 +1,29 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
 local_path = Path('../private_files/private_file.env')
-current_parent_path = Path(__file__).parent
-global_path = (current_parent_path / local_path).resolve()
 
-load_dotenv(global_path)
+_env_loaded = False
 
 
-QUANTUM_TOKEN_API = os.environ.get("QUANTUM_TOKEN")
+#Файл с ключами читается при первом обращении, а не при импорте:
+#локальным путям (генерация ключей, аналитическая проверка) облачный токен не нужен
+def load_private_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        global_path = (Path(__file__).parent / local_path).resolve()
+        load_dotenv(global_path)
+        _env_loaded = True
 
+
+def get_quantum_token_api():
+    load_private_env()
+    return os.environ.get("QUANTUM_TOKEN")
+
+
+#from const.constants import QUANTUM_TOKEN_API по-прежнему работает — значение вычисляется лениво
+def __getattr__(name):
+    if name == "QUANTUM_TOKEN_API":
+        return get_quantum_token_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
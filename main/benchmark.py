@@ -0,0 +1,203 @@
+import argparse
+import json
+import sys
+
+from qubits.benchmark import (
+    IMPORT_TARGETS, MEMORY_NOISE_FLOOR, NOISE_FLOOR, STAGES, compare_to_baseline, engine_from_spec,
+    measure_import_time, measure_mint_throughput, run_memory_suite, run_suite,
+)
+from qubits.pipeline import run_token_stream
+
+
+def parse_list(text, cast=str):
+    return [cast(item) for item in text.split(",") if item]
+
+
+#Размеры как в GUI: start, start*factor, ... (steps штук), либо явный список --qubits
+def make_sizes(args):
+    if args.qubits:
+        return parse_list(args.qubits, int)
+    sizes = []
+    cur = args.start
+    for _ in range(args.steps):
+        sizes.append(cur)
+        cur *= args.factor
+    return sizes
+
+
+def print_case(case):
+    stages = " ".join(f"{stage}={case['stages'][stage]['median']:.6f}" for stage in STAGES)
+    print(
+        f"{case['engine']:>10} shots={case['shots']:<8} qubits={case['qubits']:<6} "
+        f"median={case['total']['median']:.6f} p95={case['total']['p95']:.6f} | {stages}",
+        file=sys.stderr,
+    )
+
+
+def kib(value):
+    return "—" if value is None else f"{value / 1024:.1f}"
+
+
+def print_memory_case(case):
+    stages = " ".join(f"{stage}={kib(case['stages'][stage]['peak'])}" for stage in STAGES)
+    total = case["total"]
+    print(
+        f"{case['engine']:>10} shots={case['shots']:<8} qubits={case['qubits']:<6} "
+        f"peak={kib(total['peak'])} KiB token={kib(case['bytes_per_token'])} KiB "
+        f"({case['bytes_per_qubit']:.0f} Б/кубит) rss_peak={kib(total['rss_peak'])} KiB | пик по этапам, KiB: {stages}",
+        file=sys.stderr,
+    )
+
+
+def print_import(row):
+    heavy = ", ".join(row["heavy"]) or "—"
+    print(
+        f"{row['module']:>20} import={row['import']['median'] * 1000:.1f} ms "
+        f"startup={row['startup']['median'] * 1000:.1f} ms | тяжёлые модули: {heavy}",
+        file=sys.stderr,
+    )
+
+
+def print_mint(row):
+    print(
+        f"{row['sink']:>8} {row['source']:>7} tokens={row['tokens']:<8} qubits={row['qubits']:<6} "
+        f"median={row['seconds']['median']:.4f} s | {row['qubits_per_second'] / 1e6:.2f} M кубитов/с",
+        file=sys.stderr,
+    )
+
+
+def print_stream(qubits, rows):
+    for row in rows:
+        print(
+            f"qubits={qubits:<6} {row['stage']:>8} items={row['items']:<8} busy={row['busy']:.4f} s "
+            f"wait_in={row['wait_input']:.4f} s wait_out={row['wait_output']:.4f} s "
+            f"| {row['throughput']:.1f} токенов/с",
+            file=sys.stderr,
+        )
+
+
+def write_report(report, output):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера квантового токена без GUI")
+    parser.add_argument("--qubits", help="список размеров через запятую, например 2,4,8,16")
+    parser.add_argument("--start", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--factor", type=int, default=2)
+    parser.add_argument("--shots", default="10000", help="список значений через запятую")
+    parser.add_argument("--permissible", type=int, default=50)
+    parser.add_argument("--engines", default="analytic", help="analytic, qvm, qvm:K, qvm:auto через запятую")
+    parser.add_argument("--representation", choices=["objects", "batch"], default="objects")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--no-check", action="store_true", help="не выполнять measure_token")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допустимый рост медианы, доля")
+    parser.add_argument("--import-time", action="store_true",
+                        help="вместо конвейера измерить время импорта модулей в новом процессе")
+    parser.add_argument("--mint", type=int, metavar="M",
+                        help="вместо конвейера измерить массовый выпуск M токенов каждого размера")
+    parser.add_argument("--seed", type=int, help="зерно для --mint и --stream (по умолчанию криптостойкий источник)")
+    parser.add_argument("--stream", type=int, metavar="M",
+                        help="вместо конвейера прогнать поток из M токенов каждого размера через qubits.pipeline")
+    parser.add_argument("--buffer", type=int, default=8, help="размер очереди каждого этапа для --stream")
+    parser.add_argument("--memory", action="store_true",
+                        help="вместо времени измерить память (tracemalloc и пиковый RSS) по этапам и размерам")
+    parser.add_argument("--memory-metric", choices=["peak", "retained", "rss_peak"], default="peak",
+                        help="метрика памяти для сравнения с --baseline")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="для --memory: все размеры в этом процессе (пиковый RSS тогда накопительный)")
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        engine_spec = parse_list(args.engines)[0]
+        shots = parse_list(args.shots, int)[0]
+        report = {"engine": engine_spec, "shots": shots, "stream": []}
+        for n in make_sizes(args):
+            failed = []
+            pipeline = run_token_stream(
+                args.stream, engine_from_spec(engine_spec), n, shots, args.permissible,
+                record=lambda job: failed.append(job.token_id) if not job.ok else None,
+                rng=args.seed, buffer=args.buffer,
+            )
+            rows = pipeline.report()
+            print_stream(n, rows)
+            report["stream"].append({"qubits": n, "tokens": args.stream, "failed": len(failed), "stages": rows})
+        write_report(report, args.output)
+        return 0
+
+    if args.mint:
+        rows = []
+        for n in make_sizes(args):
+            for sink in ("keyring", "file"):
+                rows.append(measure_mint_throughput(args.mint, n, sink, args.seed, repeats=args.repeats))
+                print_mint(rows[-1])
+        write_report({"mint": rows}, args.output)
+        return 0
+
+    if args.import_time:
+        rows = []
+        for module in IMPORT_TARGETS:
+            rows.append(measure_import_time(module, repeats=args.repeats))
+            print_import(rows[-1])
+        write_report({"imports": rows}, args.output)
+        return 0
+
+    if args.memory:
+        report = run_memory_suite(
+            sizes=make_sizes(args),
+            engines=parse_list(args.engines),
+            shots_list=parse_list(args.shots, int),
+            permissible=args.permissible,
+            repeats=args.repeats,
+            do_check=not args.no_check,
+            representation=args.representation,
+            isolate=not args.no_isolate,
+            progress=print_memory_case,
+        )
+        metric, noise_floor, fmt = args.memory_metric, MEMORY_NOISE_FLOOR, ".0f"
+    else:
+        report = run_suite(
+            sizes=make_sizes(args),
+            engines=parse_list(args.engines),
+            shots_list=parse_list(args.shots, int),
+            permissible=args.permissible,
+            warmup=args.warmup,
+            repeats=args.repeats,
+            do_check=not args.no_check,
+            representation=args.representation,
+            progress=print_case,
+        )
+        metric, noise_floor, fmt = "median", NOISE_FLOOR, ".6f"
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare_to_baseline(report, baseline, threshold=args.threshold, metric=metric,
+                                         noise_floor=noise_floor)
+        report["comparison"] = comparison
+        regressions = [row for row in comparison if row["regression"]]
+        for row in regressions:
+            print(
+                f"РЕГРЕССИЯ {row['engine']} shots={row['shots']} qubits={row['qubits']} {row['stage']}: "
+                f"{row['baseline']:{fmt}} -> {row['current']:{fmt}} (x{row['ratio']:.2f})",
+                file=sys.stderr,
+            )
+        if regressions:
+            exit_code = 1
+
+    write_report(report, args.output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import argparse
+import json
+
+from qubits.calibration import (
+    DEFAULT_MAX_SHOTS, DEFAULT_TARGET_FAR, DEFAULT_TARGET_FRR, Calibrator,
+)
+from qubits.noise import NoiseModel
+
+
+def print_calibration(qubits, calibration):
+    if calibration is None:
+        print(f"{qubits:>6}  не достигается за допустимое число выстрелов")
+        return
+    print(f"{qubits:>6}  shots={calibration.shots:<8} permissible={calibration.permissible:<6} "
+          f"FAR={calibration.far:.2e}  FRR={calibration.frr:.2e}  выстрелов на токен={calibration.cost}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор shots и permissible по целевым FAR и FRR")
+    parser.add_argument("--qubits", default="1,2,4,8,16,32,64", help="размеры токена через запятую")
+    parser.add_argument("--far", type=float, default=DEFAULT_TARGET_FAR, help="допустимая вероятность принять подделку")
+    parser.add_argument("--frr", type=float, default=DEFAULT_TARGET_FRR,
+                        help="допустимая вероятность отклонить честный токен")
+    parser.add_argument("--forged-rate", type=float,
+                        help="доля единиц у подделки (по умолчанию — неверные случайные углы)")
+    parser.add_argument("--max-shots", type=int, default=DEFAULT_MAX_SHOTS)
+    parser.add_argument("--depolarizing", type=float, default=0.0)
+    parser.add_argument("--amplitude-damping", type=float, default=0.0)
+    parser.add_argument("--readout-error-0", type=float, default=0.0)
+    parser.add_argument("--readout-error-1", type=float, default=0.0)
+    parser.add_argument("--idle-layers", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args(argv)
+
+    noise = NoiseModel(args.depolarizing, args.amplitude_damping, args.readout_error_0, args.readout_error_1,
+                       args.idle_layers)
+    calibrator = Calibrator(args.far, args.frr, noise, forged_rate=args.forged_rate, max_shots=args.max_shots)
+    sizes = [int(value) for value in args.qubits.split(",")]
+    results = calibrator.calibrate_sizes(sizes)
+
+    if args.json:
+        print(json.dumps({
+            "noise": noise.to_dict(),
+            "results": [None if result is None else result.to_dict() for result in results],
+        }, indent=2))
+        return
+    print(f"Доля единиц у честного кубита: {calibrator.honest_rate:.4g}")
+    for qubits, calibration in zip(sizes, results):
+        print_calibration(qubits, calibration)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
+import logging
 import time
 
 import numpy as np
+from pyqpanda3.core import CPUQVM
 from qubits.qubit_func import *
+
+# сообщения библиотеки о кубитах выводятся в консоль, как и раньше
+logging.basicConfig(level=logging.INFO, format="%(message)s")
 simulator = CPUQVM()
 number_of_qubits = 2
 shots = 10000
@@ -1,73 +1,371 @@
 import sys
 import time
 import csv
+from collections import deque
 from datetime import datetime
 
-from PySide6.QtCore import Qt, QObject, Signal, Slot, QThread
+import numpy as np
+from PySide6.QtCore import (
+    Qt, QObject, Signal, Slot, QThread, QAbstractListModel, QAbstractTableModel, QModelIndex, QTimer
+)
+from PySide6.QtCharts import QChart, QChartView, QLineSeries, QLogValueAxis
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QTextEdit, QLabel, QSpinBox, QTableWidget,
-    QTableWidgetItem, QFileDialog, QMessageBox, QCheckBox
+    QPushButton, QListView, QLabel, QSpinBox, QTableWidget, QTableView,
+    QTableWidgetItem, QFileDialog, QMessageBox, QCheckBox, QProgressBar
 )
 
 # Твои импорты
+from pyqpanda3.core import CPUQVM
 from qubits.qubit_func import *  # noqa
+from qubits.benchmark import (
+    STAGES, BenchmarkCancelled, fit_scaling_exponent, measure_memory_case, run_token_pipeline, summarize,
+)
+from qubits.cache import CachedEngine
+from qubits.calibration import Calibrator
+from qubits.engines import QVMEngine, counts_dict
 
 
 # --------- Worker для бенчмарка (чтобы UI не подвисал) ---------
 class BenchmarkWorker(QObject):
-    progress = Signal(int, int, float, bool)  # row_idx, qubits, seconds, check_ok
+    # row_idx, результат: dict(qubits, repeats, seconds, seconds_p95, stages, peak_bytes, token_bytes,
+    # rss_bytes, check_ok); без замера памяти peak_bytes, token_bytes и rss_bytes — None
+    progress = Signal(int, object)
     log = Signal(str)
     finished = Signal()
     error = Signal(str)
 
-    def __init__(self, simulator, shots: int, permissible: int, sizes: list[int], do_check: bool):
+    def __init__(self, simulator, shots: int, permissible: int, sizes: list[int], do_check: bool, repeats: int = 1,
+                 measure_memory: bool = True):
         super().__init__()
         self.simulator = simulator
         self.shots = shots
         self.permissible = permissible
         self.sizes = sizes
         self.do_check = do_check
+        self.repeats = max(1, repeats)
+        self.measure_memory = measure_memory
         self._stop = False
 
     def stop(self):
         self._stop = True
 
+    def stopped(self):
+        return self._stop
+
     @Slot()
     def run(self):
         try:
             for idx, n in enumerate(self.sizes):
-                if self._stop:
-                    self.log.emit("Бенчмарк остановлен пользователем.")
-                    break
+                # repeats прогонов с раздельными временами этапов; остановка — между прогонами,
+                # чтобы проверка флага не попадала в замер времени
+                samples = {stage: [] for stage in STAGES}
+                totals = []
+                check_ok = True
+                for _ in range(self.repeats):
+                    if self._stop:
+                        raise BenchmarkCancelled()
+                    times, ok = run_token_pipeline(n, self.simulator, self.shots, self.permissible, self.do_check)
+                    for stage in STAGES:
+                        samples[stage].append(times[stage])
+                    totals.append(times["total"])
+                    check_ok = check_ok and ok
+
+                # память — отдельным прогоном под tracemalloc, чтобы не искажать время;
+                # остановка проверяется перед каждым этапом этого прогона
+                memory = {"total": {"peak": None, "rss": None}, "bytes_per_token": None}
+                if self.measure_memory:
+                    memory = measure_memory_case(n, self.simulator, self.shots, self.permissible, self.do_check,
+                                                 should_stop=self.stopped)
+
+                total = summarize(totals)
+                self.progress.emit(idx, {
+                    "qubits": n,
+                    "repeats": self.repeats,
+                    "seconds": total["median"],
+                    "seconds_p95": total["p95"],
+                    "stages": {stage: summarize(samples[stage])["median"] for stage in STAGES},
+                    "peak_bytes": memory["total"]["peak"],
+                    "token_bytes": memory["bytes_per_token"],
+                    "rss_bytes": memory["total"]["rss"],
+                    "check_ok": check_ok,
+                })
 
-                # 1) приватные
-                private = generate_random_private_qbits(number_of_qbits_in_token=n)
+            self.finished.emit()
+        except BenchmarkCancelled:
+            self.log.emit("Бенчмарк остановлен пользователем.")
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(f"{type(e).__name__}: {e}")
 
-                # 2) публичные + токен + spin/reverse (и при желании проверка)
-                start = time.perf_counter()
 
-                public = make_public_qbits_array(private_qbits_array=private)
-                token = Token(1, public)
+# --------- Worker для ручных действий (генерация/проверка) ---------
+class TaskCancelled(Exception):
+    pass
 
-                make_spin_for_all_qbits_in_token(token, private)
-                reverse_qbits_in_token(token, private)
 
-                check_ok = True
-                if self.do_check:
-                    check_ok = bool(measure_token(self.simulator, token, self.shots, self.permissible))
+# Выполняет fn(task) в отдельном потоке. fn только считает и возвращает результат,
+# весь вывод в лог делает UI-поток уже после done — поэтому seconds в done
+# это чистое время вычислений без отрисовки
+class TaskWorker(QObject):
+    progress = Signal(int, int)
+    done = Signal(object, float)
+    cancelled = Signal()
+    error = Signal(str)
+    finished = Signal()
 
-                elapsed = time.perf_counter() - start
-                qubits_count = len(token.array_of_public_qbits)
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.total = 0
+        self.completed = 0
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
 
-                self.progress.emit(idx, qubits_count, elapsed, check_ok)
+    def check_cancelled(self):
+        if self._stop:
+            raise TaskCancelled()
 
-            self.finished.emit()
+    def begin(self, total: int):
+        self.total = total
+        self.completed = 0
+        self.progress.emit(0, total)
+
+    def step(self, count: int = 1):
+        self.completed += count
+        self.progress.emit(self.completed, self.total)
+
+    @Slot()
+    def run(self):
+        try:
+            start = time.perf_counter()
+            result = self.fn(self)
+            self.done.emit(result, time.perf_counter() - start)
+        except TaskCancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(f"{type(e).__name__}: {e}")
+        self.finished.emit()
+
+
+MEASURE_CHUNK = 32
+
+
+#Измерение кубитов порциями по MEASURE_CHUNK: между порциями проверяется отмена
+#и отправляется прогресс
+def measure_in_chunks(task, engine, qbits, shots):
+    ones = []
+    for start in range(0, len(qbits), MEASURE_CHUNK):
+        task.check_cancelled()
+        chunk = qbits[start:start + MEASURE_CHUNK]
+        ones.append(engine.count_ones(chunk, shots))
+        task.step(len(chunk))
+    return np.concatenate(ones) if ones else np.zeros(0, dtype=np.int64)
+
+
+# --------- Модель лога: кольцевой буфер + отложенная пачечная вставка ---------
+# Строки копятся в pending и попадают в модель раз в FLUSH_INTERVAL_MS одной вставкой,
+# старые строки вытесняются после MAX_LINES. QListView рисует только видимые строки
+class LogModel(QAbstractListModel):
+    MAX_LINES = 50_000
+    FLUSH_INTERVAL_MS = 50
+
+    # сигнал после каждой вставки пачки — чтобы view мог прокрутиться вниз
+    flushed = Signal()
+
+    def __init__(self, max_lines: int = MAX_LINES, parent=None):
+        super().__init__(parent)
+        self.lines = deque(maxlen=max_lines)
+        self.pending = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+
+    def append(self, text: str):
+        self.pending.extend(text.split("\n"))
+        if not self.timer.isActive():
+            self.timer.start()
+
+    @Slot()
+    def flush(self):
+        if not self.pending:
+            return
+        max_lines = self.lines.maxlen
+        new_lines = self.pending[-max_lines:]
+        self.pending = []
+
+        overflow = len(self.lines) + len(new_lines) - max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.lines.popleft()
+            self.endRemoveRows()
+
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_lines) - 1)
+        self.lines.extend(new_lines)
+        self.endInsertRows()
+        self.flushed.emit()
+
+    def clear(self):
+        self.timer.stop()
+        self.pending = []
+        self.beginResetModel()
+        self.lines.clear()
+        self.endResetModel()
+
+    def text(self) -> str:
+        self.flush()
+        return "\n".join(self.lines)
 
 
 # ---------------------------- GUI ----------------------------
+# Колонки таблицы замеров и CSV. Для бенчмарка Seconds — медиана по повторам,
+# этапы — медианы времени этапов, Peak KiB — пик памяти Python за прогон, Token KiB — сколько
+# занимает токен с ключами и схемами, Bytes/qubit — то же на кубит, RSS Δ KiB — прирост
+# RSS процесса за прогон (пиковый RSS в GUI не показывается: он общий на весь процесс)
+STAT_COLUMNS = [
+    "Timestamp", "Qubits", "Shots", "Permissible", "Repeats", "Seconds", "Seconds p95",
+    *[stage.capitalize() for stage in STAGES], "Peak KiB", "Token KiB", "Bytes/qubit", "RSS Δ KiB", "Check",
+]
+
+# Формат каждой колонки для таблицы и CSV (None — значение как есть)
+STAT_FORMATS = [
+    None, "d", "d", "d", "d", ".6f", ".6f",
+    *[".6f" for _ in STAGES], ".1f", ".1f", ".0f", ".1f", None,
+]
+
+
+def kib(value):
+    return None if value is None else value / 1024
+
+
+#Строка замера в порядке STAT_COLUMNS: числа хранятся сырыми (KiB, байты на кубит), формат — при выводе
+def stat_values(ts: str, qubits: int, shots: int, permissible: int, seconds: float, check_ok: bool,
+                repeats: int = 1, seconds_p95: float = None, stages: dict = None, peak_bytes: int = None,
+                token_bytes: int = None, rss_bytes: int = None):
+    stages = stages or {}
+    return (
+        ts, qubits, shots, permissible, repeats, seconds, seconds_p95,
+        *[stages.get(stage) for stage in STAGES],
+        kib(peak_bytes),
+        kib(token_bytes),
+        None if token_bytes is None else token_bytes / qubits,
+        kib(rss_bytes),
+        bool(check_ok),
+    )
+
+
+def format_stat(value, fmt):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "OK" if value else "FAIL"
+    return value if fmt is None else format(value, fmt)
+
+
+# --------- Модель таблицы замеров: колонки в списках + пачечная вставка ---------
+# Каждая колонка STAT_COLUMNS — отдельный список сырых значений в порядке поступления.
+# Строки копятся в pending и попадают в модель раз в FLUSH_INTERVAL_MS одной вставкой,
+# как в LogModel. Сортировка не переставляет колонки: order — номера строк в порядке
+# показа, пересчитывается одним sorted() по сырым значениям (и после каждой вставки,
+# если таблица отсортирована). DisplayRole — текст по STAT_FORMATS, Qt.UserRole — сырое значение
+class StatsModel(QAbstractTableModel):
+    FLUSH_INTERVAL_MS = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = [[] for _ in STAT_COLUMNS]
+        self.order = []
+        self.sort_column = -1
+        self.sort_order = Qt.AscendingOrder
+        self.pending = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(STAT_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return STAT_COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.columns[index.column()][self.order[index.row()]]
+        if role == Qt.DisplayRole:
+            return format_stat(value, STAT_FORMATS[index.column()])
+        if role == Qt.UserRole:
+            return value
+        return None
+
+    def append(self, values):
+        self.pending.append(values)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    @Slot()
+    def flush(self):
+        if not self.pending:
+            return
+        rows = self.pending
+        self.pending = []
+        first = self.rowCount()
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(values)
+        self.order.extend(range(first, first + len(rows)))
+        self.endInsertRows()
+        if self.sort_column >= 0:
+            self.sort(self.sort_column, self.sort_order)
+
+    #column < 0 — порядок поступления; пустые значения всегда в конце при возрастании
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            self.order = list(range(self.rowCount()))
+        else:
+            values = self.columns[column]
+            self.order = sorted(range(len(values)), key=lambda row: (values[row] is None, values[row]),
+                                reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+    def clear(self):
+        self.timer.stop()
+        self.pending = []
+        self.beginResetModel()
+        for column in self.columns:
+            column.clear()
+        self.order = []
+        self.endResetModel()
+
+    #Строки для CSV в порядке вставки, сразу из колонок
+    def formatted_rows(self):
+        self.flush()
+        for values in zip(*self.columns):
+            yield [format_stat(value, fmt) for value, fmt in zip(values, STAT_FORMATS)]
+
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -75,18 +373,25 @@ class MainWindow(QWidget):
 
         # Состояние приложения
         self.simulator = CPUQVM()
+        # ручной режим измеряет одни и те же схемы много раз — результаты кэшируются
+        self.engine = CachedEngine(QVMEngine(self.simulator))
         self.privateQbitsArray = None
         self.publicQbitsArray = None
         self.token = None
 
-        # Статистика (для CSV и таблицы)
-        # элементы: dict(qubits=int, shots=int, permissible=int, seconds=float, check_ok=bool, ts=str)
-        self.stats = []
+        # Статистика (для CSV и таблицы) — по колонкам в StatsModel
+        self.stats_model = StatsModel(parent=self)
 
         # Для бенчмарка (поток)
         self.bench_thread = None
         self.bench_worker = None
 
+        # Для ручных действий (поток) — одновременно выполняется не больше одной задачи
+        self.task_thread = None
+        self.task_worker = None
+        self.task_name = None
+        self.task_on_done = None
+
         # UI
         layout = QVBoxLayout(self)
 
@@ -112,6 +417,10 @@ class MainWindow(QWidget):
         params.addWidget(QLabel("Permissible ones:"))
         params.addWidget(self.permissible_spin)
 
+        self.btn_calibrate = QPushButton("Подобрать shots/permissible")
+        self.btn_calibrate.setToolTip("Минимальные shots и порог для FAR и FRR не выше 1e-6 при текущем числе кубитов")
+        params.addWidget(self.btn_calibrate)
+
         params.addStretch()
         layout.addLayout(params)
 
@@ -148,17 +457,36 @@ class MainWindow(QWidget):
         self.btn_gen_private = QPushButton("Сгенерировать приватные кубиты")
         self.btn_gen_public = QPushButton("Сгенерировать публичный токен")
         self.btn_check = QPushButton("Проверить токен")
+        self.btn_cancel_task = QPushButton("Отменить")
+        self.btn_cancel_task.setEnabled(False)
         self.btn_clear_log = QPushButton("Очистить лог")
+        self.task_progress = QProgressBar()
+        self.task_progress.setRange(0, 1)
+        self.task_progress.setValue(0)
 
         buttons.addWidget(self.btn_gen_private)
         buttons.addWidget(self.btn_gen_public)
         buttons.addWidget(self.btn_check)
+        buttons.addWidget(self.btn_cancel_task)
+        buttons.addWidget(self.task_progress)
         buttons.addWidget(self.btn_clear_log)
         layout.addLayout(buttons)
 
         # ---- Лог ----
-        self.log = QTextEdit()
-        self.log.setReadOnly(True)
+        log_controls = QHBoxLayout()
+        self.chk_log_details = QCheckBox("Подробно по каждому кубиту")
+        self.chk_log_details.setChecked(True)
+        log_controls.addWidget(self.chk_log_details)
+        log_controls.addStretch()
+        layout.addLayout(log_controls)
+
+        self.log_model = LogModel(parent=self)
+        self.log = QListView()
+        self.log.setModel(self.log_model)
+        self.log.setUniformItemSizes(True)
+        self.log.setEditTriggers(QListView.NoEditTriggers)
+        self.log.setSelectionMode(QListView.ExtendedSelection)
+        self.log_model.flushed.connect(self.log.scrollToBottom)
         layout.addWidget(self.log)
 
         # ---- Бенчмарк панель ----
@@ -183,10 +511,20 @@ class MainWindow(QWidget):
         bench_controls.addWidget(QLabel("Factor:"))
         bench_controls.addWidget(self.bench_factor_spin)
 
+        self.bench_repeats_spin = QSpinBox()
+        self.bench_repeats_spin.setRange(1, 100)
+        self.bench_repeats_spin.setValue(3)
+        bench_controls.addWidget(QLabel("Repeats:"))
+        bench_controls.addWidget(self.bench_repeats_spin)
+
         self.chk_bench_check = QCheckBox("Делать проверку (measure_token)")
         self.chk_bench_check.setChecked(True)
         bench_controls.addWidget(self.chk_bench_check)
 
+        self.chk_bench_memory = QCheckBox("Замер памяти (отдельный прогон)")
+        self.chk_bench_memory.setChecked(True)
+        bench_controls.addWidget(self.chk_bench_memory)
+
         bench_controls.addStretch()
 
         self.btn_bench_run = QPushButton("Запустить бенчмарк")
@@ -204,18 +542,57 @@ class MainWindow(QWidget):
         layout.addLayout(bench_controls)
 
         # ---- Таблица замеров ----
-        self.table = QTableWidget(0, 6)
-        self.table.setHorizontalHeaderLabels([
-            "Timestamp", "Qubits", "Shots", "Permissible", "Seconds", "Check"
-        ])
+        self.table = QTableView()
+        self.table.setModel(self.stats_model)
+        # до первого щелчка по заголовку строки идут в порядке поступления
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
         self.table.setSortingEnabled(True)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
         layout.addWidget(self.table)
 
+        # ---- Показатели масштабирования по этапам (t ∝ N^k) и график в логарифмических осях ----
+        layout.addWidget(QLabel("Масштабирование по этапам (t ∝ N^k, по последнему бенчмарку):"))
+        scaling = QHBoxLayout()
+        self.scaling_table = QTableWidget(0, 3)
+        self.scaling_table.setHorizontalHeaderLabels(["Stage", "k", "R²"])
+        self.scaling_table.setMaximumHeight(190)
+        self.scaling_table.setMaximumWidth(280)
+        scaling.addWidget(self.scaling_table)
+
+        self.scaling_chart = QChart()
+        self.scaling_chart.legend().setAlignment(Qt.AlignRight)
+        self.axis_qubits = QLogValueAxis()
+        self.axis_qubits.setBase(2)
+        self.axis_qubits.setLabelFormat("%d")
+        self.axis_qubits.setTitleText("Qubits")
+        self.axis_seconds = QLogValueAxis()
+        self.axis_seconds.setBase(10)
+        self.axis_seconds.setLabelFormat("%.0e")
+        self.axis_seconds.setTitleText("Seconds")
+        self.scaling_chart.addAxis(self.axis_qubits, Qt.AlignBottom)
+        self.scaling_chart.addAxis(self.axis_seconds, Qt.AlignLeft)
+        self.scaling_series = {}
+        for stage in STAGES + ("total",):
+            series = QLineSeries()
+            series.setName(stage)
+            series.setPointsVisible(True)
+            self.scaling_chart.addSeries(series)
+            series.attachAxis(self.axis_qubits)
+            series.attachAxis(self.axis_seconds)
+            self.scaling_series[stage] = series
+        self.scaling_chart_view = QChartView(self.scaling_chart)
+        self.scaling_chart_view.setMinimumHeight(190)
+        scaling.addWidget(self.scaling_chart_view)
+        layout.addLayout(scaling)
+        self.bench_rows = []
+
         # Сигналы (ручной режим)
         self.btn_gen_private.clicked.connect(self.generate_private)
         self.btn_gen_public.clicked.connect(self.generate_public_token)
         self.btn_check.clicked.connect(self.check_token)
+        self.btn_cancel_task.clicked.connect(self.cancel_task)
         self.btn_clear_log.clicked.connect(self.clear_log)
+        self.btn_calibrate.clicked.connect(self.calibrate_parameters)
 
         # Сигналы (бенчмарк)
         self.btn_bench_run.clicked.connect(self.run_benchmark)
@@ -229,86 +606,138 @@ class MainWindow(QWidget):
 
     # --------- helpers ---------
     def write(self, text: str):
-        self.log.append(text)
+        self.log_model.append(text)
 
     def clear_log(self):
-        self.log.clear()
+        self.log_model.clear()
+
+    #Вывод измерений в лог: построчно по кубиту или, если подробный лог выключен,
+    #одной сводкой по доле единиц
+    def _write_measurements(self, qbits, ones, shots: int, separator: str, describe=None):
+        if not self.chk_log_details.isChecked():
+            share = np.asarray(ones) / shots
+            self.write(f"  {len(qbits)} кубитов, доля единиц: min={share.min():.4f}, "
+                       f"mean={share.mean():.4f}, max={share.max():.4f}")
+            return
+
+        for qbit, count in zip(qbits, ones):
+            self.write(separator)
+            self.write(f"  Кубит № {qbit.id}" if describe else f"Кубит № {qbit.id}")
+            if describe:
+                for line in describe(qbit):
+                    self.write(line)
+            self.write(str(counts_dict(shots, count)))
+            self.write(separator)
 
     def clear_stats(self):
-        self.stats.clear()
-        self.table.setRowCount(0)
-
-    def _append_stat_row(self, ts: str, qubits: int, shots: int, permissible: int, seconds: float, check_ok: bool):
-        self.stats.append({
-            "ts": ts,
-            "qubits": qubits,
-            "shots": shots,
-            "permissible": permissible,
-            "seconds": seconds,
-            "check_ok": check_ok,
-        })
-
-        was_sorting = self.table.isSortingEnabled()
-        if was_sorting:
-            self.table.setSortingEnabled(False)
-
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-
-        items = [
-            QTableWidgetItem(ts),
-            QTableWidgetItem(str(qubits)),
-            QTableWidgetItem(str(shots)),
-            QTableWidgetItem(str(permissible)),
-            QTableWidgetItem(f"{seconds:.6f}"),
-            QTableWidgetItem("OK" if check_ok else "FAIL"),
-        ]
-
-        # чтобы числовая сортировка работала
-        items[1].setData(Qt.UserRole, qubits)
-        items[2].setData(Qt.UserRole, shots)
-        items[3].setData(Qt.UserRole, permissible)
-        items[4].setData(Qt.UserRole, seconds)
-
-        for c, it in enumerate(items):
-            it.setFlags(it.flags() ^ Qt.ItemIsEditable)
-            self.table.setItem(row, c, it)
-
-        if was_sorting:
-            self.table.setSortingEnabled(True)
+        self.stats_model.clear()
+        self.bench_rows = []
+        self.scaling_table.setRowCount(0)
+        self._clear_scaling_chart()
+
+    def _append_stat_row(self, ts: str, qubits: int, shots: int, permissible: int, seconds: float, check_ok: bool,
+                         repeats: int = 1, seconds_p95: float = None, stages: dict = None, peak_bytes: int = None,
+                         token_bytes: int = None, rss_bytes: int = None):
+        self.stats_model.append(stat_values(
+            ts, qubits, shots, permissible, seconds, check_ok, repeats, seconds_p95, stages, peak_bytes,
+            token_bytes, rss_bytes,
+        ))
+
+    # --------- фоновые задачи ---------
+    def _is_busy(self) -> bool:
+        return self.task_worker is not None or self.bench_worker is not None
+
+    #Запуск fn в фоне; пока идёт задача или бенчмарк, новые запуски отклоняются
+    def _start_task(self, name: str, fn, on_done) -> bool:
+        if self._is_busy():
+            running = self.task_name or "бенчмарк"
+            self.write(f"Отклонено: «{name}» — уже выполняется «{running}».")
+            return False
+
+        self.task_name = name
+        self.task_on_done = on_done
+        self.task_progress.setRange(0, 1)
+        self.task_progress.setValue(0)
+        self._set_benchmark_ui_running(True, task=True)
+
+        self.task_thread = QThread(self)
+        self.task_worker = TaskWorker(fn)
+        self.task_worker.moveToThread(self.task_thread)
+
+        self.task_thread.started.connect(self.task_worker.run)
+        self.task_worker.progress.connect(self._on_task_progress)
+        self.task_worker.done.connect(self._on_task_done)
+        self.task_worker.cancelled.connect(self._on_task_cancelled)
+        self.task_worker.error.connect(self._on_task_error)
+        self.task_worker.finished.connect(self._on_task_finished)
+
+        self.task_worker.finished.connect(self.task_thread.quit)
+        self.task_worker.finished.connect(self.task_worker.deleteLater)
+        self.task_thread.finished.connect(self.task_thread.deleteLater)
+
+        self.task_thread.start()
+        return True
+
+    def cancel_task(self):
+        if self.task_worker:
+            self.task_worker.stop()
+
+    @Slot(int, int)
+    def _on_task_progress(self, completed: int, total: int):
+        self.task_progress.setRange(0, max(total, 1))
+        self.task_progress.setValue(completed)
+
+    @Slot(object, float)
+    def _on_task_done(self, result, elapsed: float):
+        self.task_on_done(result, elapsed)
+
+    @Slot()
+    def _on_task_cancelled(self):
+        self.write(f"«{self.task_name}» отменено.")
+
+    @Slot(str)
+    def _on_task_error(self, msg: str):
+        self.write(f"Ошибка «{self.task_name}»: {msg}")
+        QMessageBox.critical(self, self.task_name, msg)
+
+    @Slot()
+    def _on_task_finished(self):
+        self.task_thread = None
+        self.task_worker = None
+        self.task_name = None
+        self.task_on_done = None
+        self._set_benchmark_ui_running(False)
 
     # --------- ручной режим ---------
     def generate_private(self):
         n = self.qubits_spin.value()
         shots = self.shots_spin.value()
-        self.check_time_label.setText("Время проверки токена: —")
-        self.generation_time_label.setText("Токен: — кубитов | Время генерации: —")
+        engine = self.engine
 
-        self.write("=== Генерация приватных кубитов ===")
-        self.privateQbitsArray = generate_random_private_qbits(number_of_qbits_in_token=n)
+        def compute(task):
+            task.begin(n)
+            private = generate_random_private_qbits(number_of_qbits_in_token=n)
+            return private, measure_in_chunks(task, engine, private, shots)
 
-        self.write("Приватные кубиты:")
-        for el in self.privateQbitsArray:
-            self.write("*********************")
-            self.write(f"  Кубит № {el.id}")
-            self.write(f"  Тета: {el.theta}")
-            self.write(f"  Фи: {el.phi}")
-            self.write(f"  Id дочернего публичного кубита: {el.public_qbit.id}")
+        def on_done(result, elapsed):
+            private, ones = result
+            self.check_time_label.setText("Время проверки токена: —")
+            self.generation_time_label.setText("Токен: — кубитов | Время генерации: —")
 
-            # Если у тебя функция называется measureQbit — это перехватит NameError
-            try:
-                m = measure_qbit(self.simulator, el, number_of_measures_of_single_qbit=shots)
-            except NameError:
-                m = measureQbit(self.simulator, el, shots)
+            self.write("=== Генерация приватных кубитов ===")
+            self.write("Приватные кубиты:")
+            self._write_measurements(private, ones, shots, "*********************", describe=lambda el: (
+                f"  Тета: {el.theta}",
+                f"  Фи: {el.phi}",
+                f"  Id дочернего публичного кубита: {el.public_qbit.id}",
+            ))
+            self.write("")
 
-            self.write(str(m))
-            self.write("*********************")
+            self.privateQbitsArray = private
+            self.publicQbitsArray = None
+            self.token = None
 
-        self.write("")
-        self.btn_gen_public.setEnabled(True)
-        self.btn_check.setEnabled(False)
-        self.publicQbitsArray = None
-        self.token = None
+        self._start_task("Генерация приватных кубитов", compute, on_done)
 
     def generate_public_token(self):
         if not self.privateQbitsArray:
@@ -316,65 +745,54 @@ class MainWindow(QWidget):
             return
 
         shots = self.shots_spin.value()
+        private = self.privateQbitsArray
+        engine = self.engine
 
-        self.write("=== Генерация публичных кубитов + токена ===")
+        def compute(task):
+            task.begin(3 * len(private))
+            public = make_public_qbits_array(private_qbits_array=private)
+            ones_public = measure_in_chunks(task, engine, public, shots)
 
-        start_time = time.perf_counter()
+            token = Token(1, public)
+            make_spin_for_all_qbits_in_token(token, private)
+            # при отмене во время измерения кубиты всё равно возвращаются в исходное состояние
+            try:
+                ones_spin = measure_in_chunks(task, engine, token.array_of_public_qbits, shots)
+            finally:
+                reverse_qbits_in_token(token, private)
+            ones_reverse = measure_in_chunks(task, engine, token.array_of_public_qbits, shots)
+            return public, token, ones_public, ones_spin, ones_reverse
 
-        self.publicQbitsArray = make_public_qbits_array(private_qbits_array=self.privateQbitsArray)
+        def on_done(result, elapsed):
+            public, token, ones_public, ones_spin, ones_reverse = result
 
-        self.write("Публичные кубиты:")
-        for el in self.publicQbitsArray:
-            self.write("___________")
-            self.write(f"Кубит № {el.id}")
-            try:
-                m = measureQbit(self.simulator, el, shots)
-            except NameError:
-                m = measure_qbit(self.simulator, el, number_of_measures_of_single_qbit=shots)
-            self.write(str(m))
-            self.write("___________")
-
-        self.token = Token(1, self.publicQbitsArray)
-
-        make_spin_for_all_qbits_in_token(self.token, self.privateQbitsArray)
-        self.write("")
-        self.write("Публичные кубиты внутри токена после спина:")
-        for el in self.token.array_of_public_qbits:
-            self.write("___________")
-            self.write(f"Кубит № {el.id}")
-            try:
-                m = measureQbit(self.simulator, el, shots)
-            except NameError:
-                m = measure_qbit(self.simulator, el, number_of_measures_of_single_qbit=shots)
-            self.write(str(m))
-            self.write("___________")
-
-        reverse_qbits_in_token(self.token, self.privateQbitsArray)
-        self.write("")
-        self.write("Публичные кубиты внутри токена после обратного спина:")
-        for el in self.token.array_of_public_qbits:
-            self.write("___________")
-            self.write(f"Кубит № {el.id}")
-            try:
-                m = measureQbit(self.simulator, el, shots)
-            except NameError:
-                m = measure_qbit(self.simulator, el, number_of_measures_of_single_qbit=shots)
-            self.write(str(m))
-            self.write("___________")
-
-        elapsed = time.perf_counter() - start_time
-        qubits_count = len(self.token.array_of_public_qbits)
-        self.generation_time_label.setText(
-            f"⏱ Токен: {qubits_count} кубитов | Время генерации: {elapsed:.6f} сек"
-        )
+            self.write("=== Генерация публичных кубитов + токена ===")
+            self.write("Публичные кубиты:")
+            self._write_measurements(public, ones_public, shots, "___________")
+            self.write("")
+            self.write("Публичные кубиты внутри токена после спина:")
+            self._write_measurements(token.array_of_public_qbits, ones_spin, shots, "___________")
+            self.write("")
+            self.write("Публичные кубиты внутри токена после обратного спина:")
+            self._write_measurements(token.array_of_public_qbits, ones_reverse, shots, "___________")
 
-        self.write("")
-        self.btn_check.setEnabled(True)
+            self.publicQbitsArray = public
+            self.token = token
 
-        # Запишем в таблицу замеров (ручной режим — тоже статистика)
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        permissible = self.permissible_spin.value()
-        self._append_stat_row(ts, qubits_count, shots, permissible, elapsed, True)
+            qubits_count = len(token.array_of_public_qbits)
+            self.generation_time_label.setText(
+                f"⏱ Токен: {qubits_count} кубитов | Время генерации: {elapsed:.6f} сек"
+            )
+
+            self.write("")
+            self.write(f"Кэш проверки: {self.engine.cache.stats()}")
+
+            # Запишем в таблицу замеров (ручной режим — тоже статистика)
+            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            permissible = self.permissible_spin.value()
+            self._append_stat_row(ts, qubits_count, shots, permissible, elapsed, True)
+
+        self._start_task("Генерация публичного токена", compute, on_done)
 
     def check_token(self):
         if not self.token:
@@ -383,45 +801,85 @@ class MainWindow(QWidget):
 
         shots = self.shots_spin.value()
         permissible = self.permissible_spin.value()
-
-        self.write("=== Проверка токена ===")
-
-        start = time.perf_counter()
-        result = measure_token(self.simulator, self.token, shots, permissible)
-        elapsed = time.perf_counter() - start
-
-        self.write("Результат проверки: " + str(result))
-
-        self.check_time_label.setText(
-            f"🔍 Время проверки токена: {elapsed:.6f} сек"
-        )
-
-        # запишем проверку в таблицу
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        qubits = len(self.token.array_of_public_qbits)
-
-        self._append_stat_row(
-            ts=ts,
-            qubits=qubits,
-            shots=shots,
-            permissible=permissible,
-            seconds=elapsed,
-            check_ok=bool(result),
-        )
+        token = self.token
+        engine = self.engine
+
+        # measure_token — один вызов движка, поэтому отмена срабатывает до или после него
+        def compute(task):
+            task.begin(1)
+            task.check_cancelled()
+            result = measure_token(engine, token, shots, permissible)
+            task.step()
+            return result
+
+        def on_done(result, elapsed):
+            self.write("=== Проверка токена ===")
+            self.write("Результат проверки: " + str(result))
+
+            self.check_time_label.setText(
+                f"🔍 Время проверки токена: {elapsed:.6f} сек"
+            )
+
+            # запишем проверку в таблицу
+            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            qubits = len(token.array_of_public_qbits)
+
+            self._append_stat_row(
+                ts=ts,
+                qubits=qubits,
+                shots=shots,
+                permissible=permissible,
+                seconds=elapsed,
+                check_ok=bool(result),
+            )
+
+        self._start_task("Проверка токена", compute, on_done)
+
+    #Подбор shots и permissible для токена из qubits_spin кубитов (симулятор без шума)
+    def calibrate_parameters(self):
+        n = self.qubits_spin.value()
+        max_shots = self.shots_spin.maximum()
+
+        def compute(task):
+            task.begin(1)
+            calibrator = Calibrator(max_shots=max_shots)
+            result = calibrator.calibrate(n)
+            task.step()
+            return result
+
+        def on_done(result, elapsed):
+            self.write("=== Подбор shots/permissible ===")
+            if result is None:
+                self.write(f"Для {n} кубитов цели FAR/FRR не достигаются за {max_shots} выстрелов.")
+                return
+            self.shots_spin.setValue(result.shots)
+            self.permissible_spin.setValue(result.permissible)
+            self.write(f"Кубитов: {n} | shots: {result.shots} | permissible: {result.permissible}")
+            self.write(f"FAR: {result.far:.2e} (цель {result.target_far:.0e}) | "
+                       f"FRR: {result.frr:.2e} (цель {result.target_frr:.0e})")
+
+        self._start_task("Подбор shots/permissible", compute, on_done)
 
     # --------- бенчмарк ---------
-    def _set_benchmark_ui_running(self, running: bool):
+    # task=True — идёт ручная задача (её отменяет «Отменить»), иначе бенчмарк
+    def _set_benchmark_ui_running(self, running: bool, task: bool = False):
         self.btn_bench_run.setEnabled(not running)
-        self.btn_bench_stop.setEnabled(running)
+        self.btn_bench_stop.setEnabled(running and not task)
+        self.btn_cancel_task.setEnabled(running and task)
 
         # чтобы не мешать состояниям — можно блокировать и ручные кнопки
         self.btn_gen_private.setEnabled(not running)
+        self.btn_calibrate.setEnabled(not running)
         self.btn_gen_public.setEnabled(not running and bool(self.privateQbitsArray))
         self.btn_check.setEnabled(not running and bool(self.token))
 
 
 
     def run_benchmark(self):
+        if self._is_busy():
+            self.write(f"Отклонено: «бенчмарк» — уже выполняется «{self.task_name or 'бенчмарк'}».")
+            return
+
         start_n = self.bench_start_spin.value()
         steps = self.bench_steps_spin.value()
         factor = self.bench_factor_spin.value()
@@ -436,8 +894,13 @@ class MainWindow(QWidget):
         shots = self.shots_spin.value()
         permissible = self.permissible_spin.value()
         do_check = self.chk_bench_check.isChecked()
+        repeats = self.bench_repeats_spin.value()
+        measure_memory = self.chk_bench_memory.isChecked()
 
-        self.write(f"=== Бенчмарк старт: sizes={sizes}, shots={shots}, permissible={permissible}, check={do_check} ===")
+        self.write(f"=== Бенчмарк старт: sizes={sizes}, shots={shots}, permissible={permissible}, "
+                   f"check={do_check}, repeats={repeats}, memory={measure_memory} ===")
+        self.bench_rows = []
+        self._clear_scaling_chart()
 
         # под бенчмарк подготовим строки в таблице (по одной на size)
         # (добавлять будем по мере готовности)
@@ -450,7 +913,9 @@ class MainWindow(QWidget):
             shots=shots,
             permissible=permissible,
             sizes=sizes,
-            do_check=do_check
+            do_check=do_check,
+            repeats=repeats,
+            measure_memory=measure_memory,
         )
         self.bench_worker.moveToThread(self.bench_thread)
 
@@ -472,19 +937,67 @@ class MainWindow(QWidget):
         if self.bench_worker:
             self.bench_worker.stop()
 
-    @Slot(int, int, float, bool)
-    def _on_bench_progress(self, idx: int, qubits: int, seconds: float, check_ok: bool):
+    @Slot(int, object)
+    def _on_bench_progress(self, idx: int, result: dict):
         shots = self.shots_spin.value()
         permissible = self.permissible_spin.value()
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        qubits = result["qubits"]
+        seconds = result["seconds"]
 
-        self._append_stat_row(ts, qubits, shots, permissible, seconds, check_ok)
+        self._append_stat_row(
+            ts, qubits, shots, permissible, seconds, result["check_ok"],
+            repeats=result["repeats"],
+            seconds_p95=result["seconds_p95"],
+            stages=result["stages"],
+            peak_bytes=result["peak_bytes"],
+            token_bytes=result["token_bytes"],
+            rss_bytes=result["rss_bytes"],
+        )
+        self.bench_rows.append(result)
+        self._update_scaling_table()
+        self._update_scaling_chart(result)
 
         # обновим “главный” лейбл, чтобы было видно последний прогон
         self.generation_time_label.setText(
             f"⏱ Токен: {qubits} кубитов | Время генерации: {seconds:.6f} сек"
         )
 
+    #Подгонка t = c * N^k по строкам текущего бенчмарка для каждого этапа и для суммы
+    def _update_scaling_table(self):
+        sizes = [row["qubits"] for row in self.bench_rows]
+        series = [(stage, [row["stages"][stage] for row in self.bench_rows]) for stage in STAGES]
+        series.append(("total", [row["seconds"] for row in self.bench_rows]))
+
+        self.scaling_table.setRowCount(len(series))
+        for r, (stage, seconds) in enumerate(series):
+            k, r2 = fit_scaling_exponent(sizes, seconds)
+            cells = [stage, "—" if k is None else f"{k:.2f}", "—" if r2 is None else f"{r2:.3f}"]
+            for c, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
+                self.scaling_table.setItem(r, c, item)
+
+    #Точки нового размера на графике; логарифмические оси не принимают нулевых времён
+    def _update_scaling_chart(self, result: dict):
+        qubits = result["qubits"]
+        points = {stage: result["stages"][stage] for stage in STAGES}
+        points["total"] = result["seconds"]
+        for stage, seconds in points.items():
+            if seconds > 0:
+                self.scaling_series[stage].append(qubits, seconds)
+
+        sizes = [row["qubits"] for row in self.bench_rows]
+        seconds = [value for row in self.bench_rows
+                   for value in (row["seconds"], *row["stages"].values()) if value > 0]
+        self.axis_qubits.setRange(min(sizes) / 1.5, max(sizes) * 1.5)
+        if seconds:
+            self.axis_seconds.setRange(min(seconds) / 2, max(seconds) * 2)
+
+    def _clear_scaling_chart(self):
+        for series in self.scaling_series.values():
+            series.clear()
+
     @Slot()
     def _on_bench_finished(self):
         self.write("=== Бенчмарк завершён ===")
@@ -502,7 +1015,8 @@ class MainWindow(QWidget):
 
     # --------- экспорт CSV ---------
     def export_csv(self):
-        if not self.stats:
+        self.stats_model.flush()
+        if not self.stats_model.rowCount():
             QMessageBox.information(self, "Экспорт CSV", "Нет данных для экспорта (таблица пуста).")
             return
 
@@ -518,16 +1032,8 @@ class MainWindow(QWidget):
         try:
             with open(path, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f, delimiter=";")
-                writer.writerow(["Timestamp", "Qubits", "Shots", "Permissible", "Seconds", "Check"])
-                for row in self.stats:
-                    writer.writerow([
-                        row["ts"],
-                        row["qubits"],
-                        row["shots"],
-                        row["permissible"],
-                        f"{row['seconds']:.6f}",
-                        "OK" if row["check_ok"] else "FAIL",
-                    ])
+                writer.writerow(STAT_COLUMNS)
+                writer.writerows(self.stats_model.formatted_rows())
             QMessageBox.information(self, "Экспорт CSV", "Файл успешно сохранён.")
         except Exception as e:
             QMessageBox.critical(self, "Экспорт CSV", f"{type(e).__name__}: {e}")
@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+
+from qubits.engines import make_engine
+from qubits.qubit_func import DEFAULT_TOKEN_TTL
+from qubits.server import DEFAULT_MAX_LINE, DEFAULT_MAX_QUBITS, TokenServer
+
+
+async def serve(args):
+    options = {"batch_size": args.batch_size} if args.engine == "qvm" else {}
+    server = TokenServer(
+        engine=make_engine(args.engine, **options),
+        window=args.window_ms / 1000,
+        max_batch=args.max_batch,
+        ttl=args.ttl,
+        max_qubits=args.max_qubits,
+        max_line=args.max_line_kib * 1024,
+    )
+    listener = await server.start(args.host, args.port)
+    print(f"Сервер проверки токенов слушает {args.host}:{args.port} (движок {args.engine})")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сервер проверки квантовых токенов (JSON по TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--engine", choices=["analytic", "qvm"], default="analytic")
+    parser.add_argument("--batch-size", default="auto", help="кубитов в одной программе для движка qvm")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="окно сбора микропакета, мс")
+    parser.add_argument("--max-batch", type=int, default=256, help="максимум запросов в микропакете")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TOKEN_TTL, help="срок жизни выданного токена, с")
+    parser.add_argument("--max-qubits", type=int, default=DEFAULT_MAX_QUBITS, help="наибольший размер токена")
+    parser.add_argument("--max-line-kib", type=int, default=DEFAULT_MAX_LINE // 1024,
+                        help="наибольшая длина строки запроса, КиБ")
+    asyncio.run(serve(parser.parse_args()))
@@ -0,0 +1,245 @@
+import numpy as np
+
+from qubits.gates import EPS, gates_for_state, state_of
+from qubits.instrumentation import metrics
+from qubits.randomness import make_rng
+from qubits.remap import compile_circuit
+
+# Пакетное (struct-of-arrays) представление ключей и токенов.
+# Вместо списка объектов PrivateQbit/PublicQbit данные лежат в непрерывных массивах NumPy,
+# а спин, обратный спин и вероятности считаются сразу для всего массива.
+# Для совместимости с кодом, который перебирает Token.array_of_public_qbits,
+# пакеты отдают лёгкие объекты-представления (view) с __slots__.
+
+
+#Представление одного приватного кубита внутри KeyBatch
+class PrivateQbitView:
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def id(self):
+        return int(self.batch.ids[self.index])
+
+    @property
+    def theta(self):
+        return float(self.batch.theta[self.index])
+
+    @property
+    def phi(self):
+        return float(self.batch.phi[self.index])
+
+    @property
+    def tag(self):
+        return None
+
+    @property
+    def gates(self):
+        return []
+
+
+#Представление одного публичного кубита внутри TokenBatch
+class PublicQbitView:
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def id(self):
+        return int(self.batch.ids[self.index])
+
+    @property
+    def tag(self):
+        return None
+
+    @property
+    def gates(self):
+        a, b = self.batch.state[self.index]
+        return gates_for_state(complex(a), complex(b))
+
+    @property
+    def depth(self):
+        return int(self.batch.depth[self.index])
+
+    @property
+    def circuit(self):
+        return compile_circuit(self.gates, self.id)
+
+    def make_spin(self, theta, phi):
+        self.batch.make_spin(theta, phi, index=self.index)
+
+    def make_reverse_spin(self, theta, phi):
+        self.batch.make_reverse_spin(theta, phi, index=self.index)
+
+
+#Общая часть пакетов: массив id и доступ к элементам как к списку
+class _QbitBatch:
+    view_class = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    #Срез даёт пакет того же типа (как срез списка), число — представление кубита
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.view_class(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.view_class(self, index)
+
+    #Позиции кубитов с заданными id в этом пакете
+    def positions_of(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if np.array_equal(self.ids, ids):
+            return slice(None)
+        order = np.argsort(self.ids, kind="stable")
+        sorted_ids = self.ids[order]
+        found = np.minimum(np.searchsorted(sorted_ids, ids), max(len(order) - 1, 0))
+        if not len(order) or not np.array_equal(sorted_ids[found], ids):
+            missing = ids[~np.isin(ids, self.ids)]
+            raise KeyError("Кубиты с id " + str(missing.tolist()) + " не найдены")
+        return order[found]
+
+
+#Пакет приватных кубитов: id, θ и φ (в градусах, как у PrivateQbit)
+class KeyBatch(_QbitBatch):
+    view_class = PrivateQbitView
+
+    def __init__(self, ids, theta, phi):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.theta = np.ascontiguousarray(theta, dtype=np.float64)
+        self.phi = np.ascontiguousarray(phi, dtype=np.float64)
+
+    @classmethod
+    def from_qbits(cls, private_qbits):
+        private_qbits = list(private_qbits)
+        return cls(
+            [q.id for q in private_qbits],
+            [q.theta for q in private_qbits],
+            [q.phi for q in private_qbits],
+        )
+
+    def take(self, positions):
+        return KeyBatch(self.ids[positions], self.theta[positions], self.phi[positions])
+
+    #Углы для кубитов с заданными id (в порядке ids)
+    def angles_for(self, ids):
+        positions = self.positions_of(ids)
+        return self.theta[positions], self.phi[positions]
+
+    #Аналог make_public_qbits_array: публичный пакет в состоянии |0⟩ с теми же id
+    def make_public(self):
+        return TokenBatch(self.ids.copy())
+
+
+#Пакет публичных кубитов: id и амплитуды состояния (a, b) каждого кубита.
+#depth — сколько физических вентилей применено к кубиту (как PublicQbit.depth); если не задана,
+#кубит с ненулевой |1⟩-компонентой считается приготовленным одним U3
+class TokenBatch(_QbitBatch):
+    view_class = PublicQbitView
+
+    def __init__(self, ids, state=None, depth=None):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        if state is None:
+            state = np.zeros((len(self.ids), 2), dtype=np.complex128)
+            state[:, 0] = 1
+        self.state = np.ascontiguousarray(state, dtype=np.complex128)
+        if depth is None:
+            depth = (np.abs(self.state[:, 1]) >= EPS).astype(np.int64)
+        self.depth = np.ascontiguousarray(depth, dtype=np.int64)
+        self._buffers = None
+
+    @classmethod
+    def from_qbits(cls, public_qbits):
+        public_qbits = list(public_qbits)
+        state = np.array([state_of(q.gates) for q in public_qbits], dtype=np.complex128).reshape(-1, 2)
+        depth = [getattr(q, "depth", len(q.gates)) for q in public_qbits]
+        return cls([q.id for q in public_qbits], state, depth)
+
+    def take(self, positions):
+        return TokenBatch(self.ids[positions], self.state[positions], self.depth[positions])
+
+    #Добавление по одному кубиту (Token.add_qbit). ids, state и depth — начала буферов с запасом,
+    #буферы растут вдвое, поэтому n добавлений стоят O(n), а не O(n²)
+    def append(self, public_qbit):
+        size = len(self.ids)
+        if not self._has_room(size):
+            capacity = max(8, 2 * size)
+            buffers = (
+                np.empty(capacity, dtype=np.int64),
+                np.empty((capacity, 2), dtype=np.complex128),
+                np.empty(capacity, dtype=np.int64),
+            )
+            for buffer, array in zip(buffers, (self.ids, self.state, self.depth)):
+                buffer[:size] = array
+            self._buffers = buffers
+        ids, state, depth = self._buffers
+        ids[size] = public_qbit.id
+        state[size] = state_of(public_qbit.gates)
+        depth[size] = getattr(public_qbit, "depth", len(public_qbit.gates))
+        self.ids, self.state, self.depth = ids[:size + 1], state[:size + 1], depth[:size + 1]
+
+    #Есть ли место в буферах; массивы могли быть заменены целиком, тогда буферы устарели
+    def _has_room(self, size):
+        if self._buffers is None or size >= len(self._buffers[0]):
+            return False
+        return all(array.base is buffer for array, buffer in zip((self.ids, self.state, self.depth), self._buffers))
+
+    def _apply_ry(self, angle, index):
+        c = np.cos(angle / 2)
+        s = np.sin(angle / 2)
+        a = self.state[index, 0]
+        b = self.state[index, 1]
+        self.state[index, 0], self.state[index, 1] = c * a - s * b, s * a + c * b
+        self.depth[index] += 1
+
+    def _apply_rz(self, angle, index):
+        self.state[index, 0] *= np.exp(-0.5j * angle)
+        self.state[index, 1] *= np.exp(0.5j * angle)
+        self.depth[index] += 1
+
+    #Спин на всём пакете (или на одном кубите index): RY(θ), затем RZ(φ). Углы в градусах
+    def make_spin(self, theta, phi, index=slice(None)):
+        self._apply_ry(np.radians(theta), index)
+        self._apply_rz(np.radians(phi), index)
+
+    def make_reverse_spin(self, theta, phi, index=slice(None)):
+        self._apply_rz(np.radians(-np.asarray(phi)), index)
+        self._apply_ry(np.radians(-np.asarray(theta)), index)
+
+    #Спин по ключам из KeyBatch — углы подбираются по id кубитов
+    def make_spin_from_keys(self, keys):
+        theta, phi = keys.angles_for(self.ids)
+        self.make_spin(theta, phi)
+
+    def make_reverse_spin_from_keys(self, keys):
+        theta, phi = keys.angles_for(self.ids)
+        self.make_reverse_spin(theta, phi)
+
+    def probabilities_of_one(self):
+        return np.minimum(1.0, np.abs(self.state[:, 1]) ** 2)
+
+
+#Пакетный аналог generate_random_private_qbits.
+#rng: None — криптостойкий источник, int или numpy.random.Generator — воспроизводимый
+def generate_random_key_batch(number_of_qbits_in_token, rng=None):
+    rng = make_rng(rng)
+    with metrics.stage("mint"):
+        keys = KeyBatch(
+            np.arange(1, number_of_qbits_in_token + 1),
+            rng.uniform(0, 180, number_of_qbits_in_token),
+            rng.uniform(0, 360, number_of_qbits_in_token),
+        )
+    metrics.inc("qubits_minted", number_of_qbits_in_token)
+    return keys
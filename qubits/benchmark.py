@@ -0,0 +1,427 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from qubits.batch import generate_random_key_batch
+from qubits.engines import make_engine
+from qubits.mint import mint_to_file, mint_to_keyring
+from qubits.qubit_func import (
+    Token, generate_random_private_qbits, make_public_qbits_array,
+    make_spin_for_all_qbits_in_token, measure_token, reverse_qbits_in_token,
+)
+
+# Бенчмарк конвейера токена без GUI: прогон по размерам токена, числу выстрелов и движкам,
+# с разогревом и повторами; по каждому этапу считаются медиана и p95.
+# Результаты — словари, готовые для JSON, и сравнение с сохранённой базовой линией.
+
+STAGES = ("mint", "publish", "spin", "reverse", "verify")
+
+#Остановка прогона по should_stop (кнопка «Остановить» в GUI) — между этапами конвейера
+class BenchmarkCancelled(Exception):
+    pass
+
+
+#Различия меньше этого порога (секунды) считаются шумом и не попадают в регрессии
+NOISE_FLOOR = 1e-4
+#То же для памяти, байты
+MEMORY_NOISE_FLOOR = 16 * 1024
+
+
+#Движок по строке: "analytic", "qvm" или "qvm:K" (K кубитов в одной программе, "qvm:auto"),
+#"noisy" или "noisy:depolarizing=0.001;readout_error_0=0.02" (параметры NoiseModel)
+def engine_from_spec(spec):
+    name, _, option = spec.partition(":")
+    if name == "qvm" and option:
+        return make_engine(name, batch_size=option if option == "auto" else int(option))
+    if name == "noisy" and option:
+        options = {}
+        for item in option.split(";"):
+            key, _, value = item.partition("=")
+            options[key] = int(value) if key == "idle_layers" else float(value)
+        return make_engine(name, **options)
+    return make_engine(name)
+
+
+#Один прогон конвейера: ключи -> публичные кубиты -> токен -> спин -> обратный спин -> проверка.
+#representation: "objects" (PrivateQbit/PublicQbit) или "batch" (KeyBatch/TokenBatch).
+#probe (MemoryProbe) получает begin/end вокруг каждого этапа; should_stop() проверяется перед каждым этапом
+def run_token_pipeline(n, engine, shots, permissible, do_check=True, representation="objects", probe=None,
+                       should_stop=None):
+    times = {}
+
+    with _stage(times, "mint", probe, should_stop):
+        if representation == "batch":
+            private = generate_random_key_batch(n)
+        else:
+            private = generate_random_private_qbits(number_of_qbits_in_token=n)
+
+    with _stage(times, "publish", probe, should_stop):
+        if representation == "batch":
+            public = private.make_public()
+        else:
+            public = make_public_qbits_array(private_qbits_array=private)
+        # на больших размерах прогон может идти дольше штатного ttl
+        token = Token(1, public, ttl=math.inf)
+
+    with _stage(times, "spin", probe, should_stop):
+        make_spin_for_all_qbits_in_token(token, private)
+
+    with _stage(times, "reverse", probe, should_stop):
+        reverse_qbits_in_token(token, private)
+
+    check_ok = True
+    with _stage(times, "verify", probe, should_stop):
+        if do_check:
+            check_ok = bool(measure_token(engine, token, shots, permissible))
+
+    times["total"] = sum(times[stage] for stage in STAGES)
+    return times, check_ok
+
+
+@contextmanager
+def _stage(times, stage, probe=None, should_stop=None):
+    if should_stop is not None and should_stop():
+        raise BenchmarkCancelled(stage)
+    if probe is not None:
+        probe.begin(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[stage] = time.perf_counter() - start
+        if probe is not None:
+            probe.end(stage)
+
+
+#Пиковый RSS процесса за всё время его жизни (байты); None, если ОС не даёт getrusage
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает КиБ, macOS — байты
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+#Текущий RSS процесса (байты) по /proc; None, где его нет
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _difference(after, before):
+    return None if after is None or before is None else after - before
+
+
+#Память по этапам одного прогона. Для каждого этапа:
+#  allocated — прирост выделенной Python-памяти (tracemalloc) за этап,
+#  peak      — пик tracemalloc во время этапа относительно его начала,
+#  retained  — сколько держится от начала прогона к концу этапа (ключи, кубиты, схемы, токен),
+#  rss       — прирост текущего RSS процесса (память симулятора вне tracemalloc),
+#  rss_peak  — пиковый RSS процесса после этапа (монотонный за жизнь процесса).
+#Трассировка должна быть включена (tracemalloc.start()) на всё время прогона
+class MemoryProbe:
+    def __init__(self):
+        self.base, _ = tracemalloc.get_traced_memory()
+        self.rss_base = peak_rss_bytes()
+        self.stages = {}
+        self._begin = None
+
+    #RSS читается до сброса пика и после снятия tracemalloc, чтобы буфер чтения /proc не попал в замер
+    def begin(self, stage):
+        rss = current_rss_bytes()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        self._begin = (current, rss)
+
+    def end(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        begin, rss_begin = self._begin
+        self.stages[stage] = {
+            "allocated": current - begin,
+            "peak": max(0, peak - begin),
+            "retained": current - self.base,
+            "rss": _difference(current_rss_bytes(), rss_begin),
+            "rss_peak": peak_rss_bytes(),
+        }
+
+    #Итог прогона: наибольший пик относительно начала прогона, наибольшее удержание
+    #и прирост текущего RSS за все этапы (в отличие от rss_peak — только этого прогона)
+    def total(self):
+        peaks = [stats["peak"] + stats["retained"] - stats["allocated"] for stats in self.stages.values()]
+        rss = [stats["rss"] for stats in self.stages.values()]
+        rss_peak = peak_rss_bytes()
+        return {
+            "peak": max(peaks, default=0),
+            "retained": max((stats["retained"] for stats in self.stages.values()), default=0),
+            "rss": None if None in rss else sum(rss),
+            "rss_peak": rss_peak,
+            "rss_growth": _difference(rss_peak, self.rss_base),
+        }
+
+
+#Память одного набора параметров: repeats прогонов под tracemalloc, по каждому числу — медиана.
+#Трассировка замедляет выделения, поэтому эти прогоны делаются отдельно от замеров времени
+def measure_memory_case(n, engine, shots, permissible, do_check=True, representation="objects", repeats=1,
+                        should_stop=None):
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    probes = []
+    try:
+        for _ in range(max(1, repeats)):
+            probe = MemoryProbe()
+            run_token_pipeline(n, engine, shots, permissible, do_check, representation, probe, should_stop)
+            probes.append(probe)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    def median(rows, key):
+        values = [row[key] for row in rows if row[key] is not None]
+        return int(np.median(values)) if values else None
+
+    stages = {
+        stage: {key: median([probe.stages[stage] for probe in probes], key) for key in probes[0].stages[stage]}
+        for stage in STAGES
+    }
+    totals = [probe.total() for probe in probes]
+    total = {key: median(totals, key) for key in totals[0]}
+    # токен со своими ключами и схемами — то, что держится к концу обратного спина
+    token_bytes = stages["reverse"]["retained"]
+    return {
+        "qubits": n,
+        "shots": shots,
+        "permissible": permissible,
+        "representation": representation,
+        "repeats": len(probes),
+        "stages": stages,
+        "total": total,
+        "bytes_per_token": token_bytes,
+        "bytes_per_qubit": token_bytes / n,
+    }
+
+
+#Показатель степени k в модели t = c * N^k (МНК в логарифмических осях) и R² подгонки.
+#Нужны хотя бы два разных размера и положительные времена, иначе (None, None)
+def fit_scaling_exponent(sizes, seconds):
+    sizes = np.asarray(sizes, dtype=np.float64)
+    seconds = np.asarray(seconds, dtype=np.float64)
+    mask = (sizes > 0) & (seconds > 0)
+    sizes, seconds = sizes[mask], seconds[mask]
+    if len(np.unique(sizes)) < 2:
+        return None, None
+    x = np.log(sizes)
+    y = np.log(seconds)
+    k, c = np.polyfit(x, y, 1)
+    residual = y - (k * x + c)
+    total = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - (residual ** 2).sum() / total if total > 0 else 1.0
+    return float(k), float(r2)
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "median": float(np.median(values)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+
+
+#Серия прогонов одного набора параметров: warmup прогонов не учитываются
+def measure_case(n, engine, shots, permissible, warmup=1, repeats=5, do_check=True, representation="objects"):
+    for _ in range(warmup):
+        run_token_pipeline(n, engine, shots, permissible, do_check, representation)
+    samples = {stage: [] for stage in STAGES + ("total",)}
+    checks = 0
+    for _ in range(repeats):
+        times, check_ok = run_token_pipeline(n, engine, shots, permissible, do_check, representation)
+        for stage, seconds in times.items():
+            samples[stage].append(seconds)
+        checks += check_ok
+    return {
+        "qubits": n,
+        "shots": shots,
+        "permissible": permissible,
+        "representation": representation,
+        "repeats": repeats,
+        "check_ok_rate": checks / repeats,
+        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+        "total": summarize(samples["total"]),
+    }
+
+
+#Полный прогон по всем сочетаниям engines x shots x sizes
+def run_suite(sizes, engines=("analytic",), shots_list=(10000,), permissible=50, warmup=1, repeats=5,
+              do_check=True, representation="objects", progress=None):
+    results = []
+    for spec in engines:
+        engine = engine_from_spec(spec)
+        for shots in shots_list:
+            for n in sizes:
+                case = measure_case(n, engine, shots, permissible, warmup, repeats, do_check, representation)
+                case["engine"] = spec
+                results.append(case)
+                if progress is not None:
+                    progress(case)
+    return {"meta": _meta(warmup=warmup, repeats=repeats), "results": results}
+
+
+def _meta(**extra):
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **extra,
+    }
+
+
+_MEMORY_PROBE = """
+import json
+from qubits.benchmark import engine_from_spec, measure_memory_case
+case = measure_memory_case({n}, engine_from_spec({spec!r}), {shots}, {permissible}, {do_check}, {representation!r},
+                           {repeats})
+print(json.dumps(case))
+"""
+
+
+#Память по всем сочетаниям engines x shots x sizes. Пиковый RSS монотонен за жизнь процесса,
+#поэтому при isolate=True каждый случай идёт в новом интерпретаторе и rss_peak относится только к нему
+def run_memory_suite(sizes, engines=("analytic",), shots_list=(10000,), permissible=50, repeats=1,
+                     do_check=True, representation="objects", isolate=True, progress=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for spec in engines:
+        engine = None if isolate else engine_from_spec(spec)
+        for shots in shots_list:
+            for n in sizes:
+                if isolate:
+                    probe = _MEMORY_PROBE.format(n=n, spec=spec, shots=shots, permissible=permissible,
+                                                 do_check=do_check, representation=representation, repeats=repeats)
+                    done = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True,
+                                          check=True)
+                    case = json.loads(done.stdout.splitlines()[-1])
+                else:
+                    case = measure_memory_case(n, engine, shots, permissible, do_check, representation, repeats)
+                case["engine"] = spec
+                results.append(case)
+                if progress is not None:
+                    progress(case)
+    return {"meta": _meta(mode="memory", repeats=repeats, isolate=isolate), "results": results}
+
+
+#Скорость массового выпуска ключей: sink "keyring" или "file",
+#seed=None — криптостойкий источник, иначе numpy.random.Generator с этим зерном
+def measure_mint_throughput(tokens, qubits, sink="keyring", seed=None, repeats=3):
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            if sink == "file":
+                mint_to_file(os.path.join(directory, "keys.qtk"), tokens, qubits, rng=seed)
+            else:
+                mint_to_keyring(tokens, qubits, rng=seed)
+            samples.append(time.perf_counter() - start)
+    seconds = summarize(samples)
+    return {
+        "tokens": tokens,
+        "qubits": qubits,
+        "sink": sink,
+        "source": "csprng" if seed is None else "seeded",
+        "seconds": seconds,
+        "qubits_per_second": tokens * qubits / seconds["median"],
+    }
+
+
+#Модули, время импорта которых меряется в чистом интерпретаторе (--import-time)
+IMPORT_TARGETS = ("qubits.qubit_func", "qubits.engines", "qubits.server", "main.server")
+#Тяжёлые зависимости, которые не должны подгружаться на лёгких путях
+HEAVY_MODULES = ("pyqpanda3", "PySide6", "dotenv")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = sorted({{name.partition(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+#Время импорта модуля в новом процессе: import — сам импорт, startup — запуск
+#интерпретатора вместе с импортом (то, что видит пользователь CLI)
+def measure_import_time(module, repeats=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    imports = []
+    startups = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True)
+        startups.append(time.perf_counter() - start)
+        result = json.loads(done.stdout.splitlines()[-1])
+        imports.append(result["seconds"])
+    return {
+        "module": module,
+        "repeats": repeats,
+        "import": summarize(imports),
+        "startup": summarize(startups),
+        "heavy": result["heavy"],
+    }
+
+
+def _case_key(case):
+    return case["engine"], case["shots"], case["qubits"], case.get("representation", "objects")
+
+
+#Сравнение с базовой линией: регрессия — рост метрики больше чем на threshold (доля).
+#metric — "median" или "p95" для времени (run_suite), "peak", "retained" или "rss_peak"
+#для памяти (run_memory_suite, тогда noise_floor=MEMORY_NOISE_FLOOR)
+def compare_to_baseline(current, baseline, threshold=0.10, metric="median", noise_floor=NOISE_FLOOR):
+    base_cases = {_case_key(case): case for case in baseline["results"]}
+    rows = []
+    for case in current["results"]:
+        base = base_cases.get(_case_key(case))
+        if base is None:
+            continue
+        pairs = [("total", case["total"], base["total"])]
+        pairs += [(stage, case["stages"][stage], base["stages"][stage])
+                  for stage in case["stages"] if stage in base["stages"]]
+        for stage, now, before in pairs:
+            # базовая линия другого режима (время против памяти) не сравнивается
+            if now.get(metric) is None or before.get(metric) is None:
+                continue
+            old = before[metric]
+            new = now[metric]
+            ratio = new / old if old > 0 else math.inf if new > 0 else 1.0
+            rows.append({
+                "engine": case["engine"],
+                "shots": case["shots"],
+                "qubits": case["qubits"],
+                "stage": stage,
+                "baseline": old,
+                "current": new,
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold and new - old > noise_floor,
+            })
+    return rows
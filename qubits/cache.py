@@ -0,0 +1,123 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from qubits.engines import counts_dict
+
+# Кэш результатов проверки. Ключ — отпечаток канонического списка вентилей кубита
+# вместе с именем движка, значение — распределение исхода (P(1)).
+# Распределение не зависит от числа выстрелов, поэтому при попадании свежие количества
+# единиц выбираются биномиально из сохранённой вероятности для любого shots.
+# Кэшируются только движки, которые отдают точные вероятности (probabilities_of_one):
+# повторная выборка из оценки по конечному числу выстрелов была бы смещённой,
+# поэтому остальные движки (например, облачный) работают в обход кэша.
+
+#Сколько значащих цифр угла учитывается в отпечатке
+ANGLE_DIGITS = 12
+
+
+#depth — число физических вентилей; учитывается только для шумных движков, где от него зависит P(1)
+def circuit_fingerprint(gates, engine_name, depth=None):
+    canonical = [engine_name] if depth is None else [engine_name, f"depth={depth}"]
+    for name, *params in gates:
+        canonical.append(name)
+        canonical.extend(format(param, f".{ANGLE_DIGITS}g") for param in params)
+    return hashlib.blake2b("|".join(canonical).encode(), digest_size=16).digest()
+
+
+#Ограниченный LRU-кэш с необязательным временем жизни записей (ttl, секунды)
+class VerificationCache:
+    def __init__(self, maxsize=65536, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires = entry
+        if expires is not None and expires <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+#Обёртка над движком: P(1) берутся из кэша, промахи считаются движком одним вызовом
+class CachedEngine:
+    def __init__(self, engine, cache=None, seed=None):
+        self.engine = engine
+        self.cache = cache if cache is not None else VerificationCache()
+        self.rng = np.random.default_rng(seed)
+        self.name = engine.name
+        self.depth_sensitive = hasattr(engine, "noise")
+
+    @property
+    def cacheable(self):
+        return hasattr(self.engine, "probabilities_of_one")
+
+    def probabilities_of_one(self, qbits):
+        qbits = list(qbits)
+        probabilities = np.zeros(len(qbits), dtype=np.float64)
+        missing = []
+        keys = []
+        for index, qbit in enumerate(qbits):
+            key = circuit_fingerprint(qbit.gates, self.name,
+                                      getattr(qbit, "depth", None) if self.depth_sensitive else None)
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(index)
+                keys.append(key)
+            else:
+                probabilities[index] = cached
+        if missing:
+            computed = self.engine.probabilities_of_one([qbits[i] for i in missing])
+            probabilities[missing] = computed
+            for key, value in zip(keys, computed):
+                self.cache.put(key, float(value))
+        return probabilities
+
+    def count_ones(self, qbits, shots):
+        if not self.cacheable:
+            return self.engine.count_ones(qbits, shots)
+        return self.rng.binomial(shots, np.clip(self.probabilities_of_one(qbits), 0.0, 1.0))
+
+    def counts(self, qbit, shots):
+        if not self.cacheable:
+            return self.engine.counts(qbit, shots)
+        return counts_dict(shots, self.count_ones([qbit], shots)[0])
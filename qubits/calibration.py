@@ -0,0 +1,238 @@
+import math
+
+import numpy as np
+
+from qubits.noise import TOKEN_GATE_DEPTH, NoiseModel
+
+# Подбор числа выстрелов и порога единиц по целевым вероятностям ошибок вместо
+# постоянных shots = 10000 и permissible = 50.
+# Токен принимается, если у каждого из N кубитов единиц не больше порога t за s выстрелов:
+#   FRR — отклонить честный токен: 1 - (1 - P(Bin(s, p0) > t))^N, p0 — доля единиц
+#         у честного кубита после обратного спина с учётом шума;
+#   FAR — принять поддельный токен: (E[P(Bin(s, q) <= t)])^N, среднее по атаке.
+# Атака по умолчанию — неверные углы: после обратного спина настоящими ключами
+# у подделки P(1) = sin²(θ/2), θ равномерно в [0, π], как у ключей. Кубиты с малым θ
+# почти неотличимы от честных, поэтому FAR кубита убывает медленно (~1/√(πs)),
+# а у токена — как степень N. Вместо этого можно задать одну долю forged_rate,
+# как у SequentialTest. Шум (qubits.noise) одинаково действует на честные
+# и поддельные кубиты: layers шумных слоёв (по умолчанию четыре физических вентиля
+# спина и обратного спина плюс idle_layers модели) и ошибки считывания.
+# Хвосты биномиального распределения считаются векторно по всем k сразу через
+# логарифмы факториалов.
+# Выполнимость по s не монотонна. Порог t*(s) — наименьший, при котором FRR не выше цели, —
+# с ростом s не убывает, и на каждом его повышении FAR скачком растёт. При постоянном пороге
+# FAR с ростом s только убывает, поэтому на каждой ступени порога выполнимо лишь её
+# окончание. Первое выполнимое s ищется удвоением и делением пополам, затем ступени ниже
+# него перебираются сверху вниз; так находится истинный минимум. Если при удвоении
+# до max_shots выполнимое s не встретилось, калибровка не удалась.
+
+DEFAULT_TARGET_FAR = 1e-6
+DEFAULT_TARGET_FRR = 1e-6
+DEFAULT_MAX_SHOTS = 10 ** 6
+DEFAULT_FORGED_POINTS = 1024
+FORGED_CHUNK = 64
+
+
+#log k! для k = 0..n
+def _log_factorials(n):
+    values = np.zeros(n + 1)
+    np.cumsum(np.log(np.arange(1, n + 1)), out=values[1:])
+    return values
+
+
+#Вероятности Bin(shots, p) для k = 0..upto, форма (len(p), upto + 1)
+def binomial_pmf(shots, p, upto=None, log_factorials=None):
+    upto = shots if upto is None else min(upto, shots)
+    log_factorials = _log_factorials(shots) if log_factorials is None else log_factorials
+    p = np.asarray(p, dtype=np.float64).reshape(-1, 1)
+    k = np.arange(upto + 1)
+    log_choose = log_factorials[shots] - log_factorials[k] - log_factorials[shots - k]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ones = np.where(k == 0, 0.0, k * np.log(p))
+        zeros = np.where(k == shots, 0.0, (shots - k) * np.log1p(-p))
+    return np.exp(log_choose + ones + zeros)
+
+
+#P(Bin(shots, p) <= k) для k = 0..upto
+def binomial_cdf(shots, p, upto=None, log_factorials=None):
+    return np.minimum(np.cumsum(binomial_pmf(shots, p, upto, log_factorials), axis=1), 1.0)
+
+
+#P(Bin(shots, p) > k) для k = 0..shots; хвост суммируется с конца, без вычитания из единицы
+def binomial_sf(shots, p, log_factorials=None):
+    pmf = binomial_pmf(shots, p, log_factorials=log_factorials)
+    tail = np.cumsum(pmf[:, ::-1], axis=1)[:, ::-1]
+    return np.minimum(np.concatenate([tail[:, 1:], np.zeros((len(pmf), 1))], axis=1), 1.0)
+
+
+#Доля прочитанных единиц у кубитов с P(1) = p_one в чистом состоянии после шума модели.
+#layers — шумных слоёв всего, по умолчанию вентили токена и простой, как у NoisyEngine
+def noisy_probability_of_one(p_one, noise=None, layers=None):
+    noise = noise if noise is not None else NoiseModel()
+    layers = TOKEN_GATE_DEPTH + noise.idle_layers if layers is None else layers
+    p_one = np.atleast_1d(np.asarray(p_one, dtype=np.float64))
+    amplitudes = np.stack([np.sqrt(1 - p_one), np.sqrt(p_one)], -1).astype(np.complex128)
+    rho = amplitudes[:, :, None] * np.conj(amplitudes[:, None, :])
+    for _ in range(layers):
+        noise.apply_gate_noise(rho)
+    return noise.apply_readout(np.clip(rho[:, 1, 1].real, 0.0, 1.0))
+
+
+#Доли единиц поддельных кубитов (узлы средней точки по θ) или одна forged_rate
+def forged_probabilities(noise=None, layers=None, forged_rate=None, points=DEFAULT_FORGED_POINTS):
+    if forged_rate is not None:
+        return np.array([forged_rate], dtype=np.float64)
+    theta = (np.arange(points) + 0.5) * math.pi / points
+    return noisy_probability_of_one(np.sin(theta / 2) ** 2, noise, layers)
+
+
+class Calibration:
+    def __init__(self, qubits, shots, permissible, far, frr, honest_rate, target_far, target_frr):
+        self.qubits = qubits
+        self.shots = shots
+        self.permissible = permissible
+        self.far = far
+        self.frr = frr
+        self.honest_rate = honest_rate
+        self.target_far = target_far
+        self.target_frr = target_frr
+
+    #Выстрелов на проверку всего токена
+    @property
+    def cost(self):
+        return self.shots * self.qubits
+
+    def to_dict(self):
+        return {
+            "qubits": self.qubits,
+            "shots": self.shots,
+            "permissible": self.permissible,
+            "far": self.far,
+            "frr": self.frr,
+            "honest_rate": self.honest_rate,
+            "target_far": self.target_far,
+            "target_frr": self.target_frr,
+            "cost": self.cost,
+        }
+
+
+class Calibrator:
+    def __init__(self, target_far=DEFAULT_TARGET_FAR, target_frr=DEFAULT_TARGET_FRR, noise=None, layers=None,
+                 forged_rate=None, forged_points=DEFAULT_FORGED_POINTS, max_shots=DEFAULT_MAX_SHOTS):
+        for value in (target_far, target_frr):
+            if not 0.0 < value < 1.0:
+                raise ValueError("Целевые вероятности ошибок должны быть в (0, 1): " + str(value))
+        self.target_far = target_far
+        self.target_frr = target_frr
+        self.noise = noise if noise is not None else NoiseModel()
+        self.max_shots = max_shots
+        self.honest_rate = float(noisy_probability_of_one(0.0, self.noise, layers)[0])
+        self.forged = forged_probabilities(self.noise, layers, forged_rate, forged_points)
+        self._log_factorials = _log_factorials(max_shots)
+
+    #Наименьший порог, при котором FRR токена из qubits кубитов не выше цели, и ошибки при нём.
+    #Возвращает (permissible, far, frr)
+    def evaluate(self, qubits, shots):
+        permissible, frr = self._threshold(qubits, shots)
+        return permissible, self._far(qubits, shots, permissible), frr
+
+    #Порог t*(shots) и FRR при нём
+    def _threshold(self, qubits, shots):
+        sf = binomial_sf(shots, self.honest_rate, self._log_factorials)[0]
+        # FRR токена = 1 - (1 - sf)^N, считается через log1p, чтобы не терять малые значения
+        frr = -np.expm1(qubits * np.log1p(-np.minimum(sf, 1 - 1e-16)))
+        permissible = int(np.argmax(frr <= self.target_frr))
+        if frr[permissible] > self.target_frr:
+            permissible = shots
+        return permissible, float(frr[permissible])
+
+    #FAR токена при заданных выстрелах и пороге. С limit считать дальше незачем, как только
+    #FAR превысил limit: узлы атаки идут по возрастанию доли единиц, и первые порции —
+    #самые похожие на честные кубиты — дают основной вклад
+    def _far(self, qubits, shots, permissible, limit=None):
+        bound = math.inf if limit is None else limit ** (1 / qubits) * len(self.forged)
+        accept = 0.0
+        # узлы атаки — порциями, чтобы матрица (узлы, t + 1) не росла с большими s
+        for part in np.array_split(self.forged, max(1, len(self.forged) // FORGED_CHUNK)):
+            accept += binomial_cdf(shots, part, permissible, self._log_factorials)[:, -1].sum()
+            if accept > bound:
+                break
+        return float(accept / len(self.forged)) ** qubits
+
+    def _feasible(self, qubits, shots):
+        permissible, far, frr = self.evaluate(qubits, shots)
+        return far <= self.target_far and frr <= self.target_frr
+
+    #FRR токена при пороге permissible через P(Bin <= t): O(t) вместо O(shots) у _threshold
+    def _frr_within(self, qubits, shots, permissible):
+        cdf = binomial_cdf(shots, self.honest_rate, permissible, self._log_factorials)[0, -1]
+        return -math.expm1(qubits * math.log1p(-min(max(1.0 - cdf, 0.0), 1 - 1e-16))) <= self.target_frr
+
+    #Конец ступени порога permissible не выше upper: наибольшее s, при котором FRR с этим порогом
+    #не выше цели (с ростом s FRR при постоянном пороге только растёт). 0, если такого s нет
+    def _step_end(self, qubits, permissible, upper):
+        if self._frr_within(qubits, upper, permissible):
+            return upper
+        step = 1
+        low = upper - step
+        while low >= 1 and not self._frr_within(qubits, low, permissible):
+            upper = low
+            step *= 2
+            low = upper - step
+        low = max(low, 0)
+        while upper - low > 1:
+            middle = (low + upper) // 2
+            if self._frr_within(qubits, middle, permissible):
+                low = middle
+            else:
+                upper = middle
+        return low
+
+    #Наименьшее выполнимое s ниже выполнимого high. Ступени порога t < t*(high) перебираются
+    #сверху вниз; на ступени выполнимым может быть лишь её конец, а если он выполним,
+    #первое выполнимое s ступени ищется делением пополам. Кандидат подтверждается evaluate()
+    def _smallest_feasible(self, qubits, high):
+        best = high
+        permissible = self._threshold(qubits, high)[0] - 1
+        end = self._step_end(qubits, permissible, high - 1) if permissible >= 0 else 0
+        while permissible >= 0 and end >= 1:
+            start = self._step_end(qubits, permissible - 1, end) + 1 if permissible else 1
+            if self._far(qubits, end, permissible, self.target_far) <= self.target_far:
+                low, shots = start - 1, end
+                while shots - low > 1:
+                    middle = (low + shots) // 2
+                    if self._far(qubits, middle, permissible, self.target_far) <= self.target_far:
+                        shots = middle
+                    else:
+                        low = middle
+                if self._feasible(qubits, shots):
+                    best = shots
+            end = start - 1
+            permissible -= 1
+        return best
+
+    #Минимальное число выстрелов для токена из qubits кубитов; None, если не хватает max_shots
+    def calibrate(self, qubits):
+        high = 1
+        while not self._feasible(qubits, high):
+            if high >= self.max_shots:
+                return None
+            high = min(2 * high, self.max_shots)
+        low = high // 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._feasible(qubits, middle):
+                high = middle
+            else:
+                low = middle
+        high = self._smallest_feasible(qubits, high)
+        permissible, far, frr = self.evaluate(qubits, high)
+        return Calibration(qubits, high, permissible, far, frr, self.honest_rate, self.target_far, self.target_frr)
+
+    #Таблица по размерам токена (1 — параметры одного кубита)
+    def calibrate_sizes(self, sizes):
+        return [self.calibrate(qubits) for qubits in sizes]
+
+
+def calibrate(qubits, target_far=DEFAULT_TARGET_FAR, target_frr=DEFAULT_TARGET_FRR, noise=None, **options):
+    return Calibrator(target_far, target_frr, noise, **options).calibrate(qubits)
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from qubits.engines import counts_dict, marginal_ones
+from qubits.remap import compile_packed_program
+
+# Выполнение проверки в облаке (QCloudService из pyqpanda3.qcloud).
+#
+# Сессии сервиса переиспользуются: get_service() держит по одной сессии на API-ключ.
+# Сервис подставляется снаружи через service_factory, поэтому вместо настоящего облака
+# можно передать локальную реализацию (LocalCloudService ниже) — с тем же интерфейсом:
+#   service.backend(name) -> backend;  backend.run(programs, shots) -> job;
+#   job.status() -> FINISHED / FAILED / ...;  job.result().get_counts_list()
+#
+# CloudEngine упаковывает кубиты в программы по program_width кубитов, программы — в задания
+# по programs_per_job штук, и отправляет задания асинхронно: не больше max_concurrency
+# одновременно, с повторами и экспоненциальной задержкой при ошибках. Задание, которое
+# не завершилось за job_timeout секунд (например, застряло в очереди), считается ошибкой
+# и тоже повторяется; перед повтором оно отменяется в облаке, чтобы не выполняться
+# (и не оплачиваться) параллельно с новым. Повторяются только CloudJobError и сетевые
+# ошибки (OSError) — ошибки в коде разбора результатов выбрасываются сразу.
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def _default_service_factory(api_key):
+    from pyqpanda3.qcloud import QCloudService
+    return QCloudService(api_key)
+
+
+#Общая сессия сервиса для ключа; повторные вызовы возвращают тот же объект
+def get_service(api_key=None, service_factory=None):
+    if api_key is None:
+        from const.constants import get_quantum_token_api
+        api_key = get_quantum_token_api()
+    factory = service_factory or _default_service_factory
+    with _services_lock:
+        key = (api_key, factory)
+        if key not in _services:
+            _services[key] = factory(api_key)
+        return _services[key]
+
+
+def close_services():
+    with _services_lock:
+        _services.clear()
+
+
+def _status_name(status):
+    return getattr(status, "name", str(status)).upper()
+
+
+class CloudJobError(RuntimeError):
+    pass
+
+
+RETRYABLE_ERRORS = (CloudJobError, OSError)
+
+
+class CloudEngine:
+    name = "cloud"
+
+    def __init__(self, backend_name="full_amplitude", api_key=None, service=None, service_factory=None,
+                 program_width=8, programs_per_job=32, max_concurrency=4,
+                 retries=3, backoff=1.0, poll_interval=1.0, job_timeout=600.0):
+        self.backend_name = backend_name
+        self.api_key = api_key
+        self._service = service
+        self.service_factory = service_factory
+        self.program_width = max(1, program_width)
+        self.programs_per_job = max(1, programs_per_job)
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self._backend = None
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = get_service(self.api_key, self.service_factory)
+        return self._service
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self.service.backend(self.backend_name)
+        return self._backend
+
+    def counts(self, qbit, shots):
+        return counts_dict(shots, self.count_ones([qbit], shots)[0])
+
+    def count_ones(self, qbits, shots):
+        return asyncio.run(self.count_ones_async(qbits, shots))
+
+    async def count_ones_async(self, qbits, shots):
+        qbits = list(qbits)
+        chunks = [qbits[start:start + self.program_width] for start in range(0, len(qbits), self.program_width)]
+        jobs = [chunks[start:start + self.programs_per_job] for start in range(0, len(chunks), self.programs_per_job)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self._run_job(semaphore, job, shots) for job in jobs))
+        ones = [marginal_ones(counts, len(chunk))
+                for job, job_counts in zip(jobs, results)
+                for chunk, counts in zip(job, job_counts)]
+        if not ones:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(ones)
+
+    #Одно задание: отправка, ожидание, разбор результатов; при ошибке — повтор с задержкой
+    async def _run_job(self, semaphore, chunks, shots):
+        programs = [compile_packed_program(chunk) for chunk in chunks]
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                job = None
+                try:
+                    job = await asyncio.to_thread(self.backend.run, programs, shots)
+                    await self._wait(job)
+                    result = await asyncio.to_thread(job.result)
+                    counts = result.get_counts_list()
+                    if len(counts) != len(programs):
+                        raise CloudJobError(f"Ожидалось {len(programs)} результатов, получено {len(counts)}")
+                    return counts
+                except RETRYABLE_ERRORS:
+                    if job is not None:
+                        await self._cancel(job)
+                    if attempt == self.retries:
+                        raise
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    #Отмена задания в облаке; ошибка отмены не мешает повтору
+    async def _cancel(self, job):
+        cancel = getattr(job, "cancel", None)
+        if cancel is None:
+            return
+        try:
+            await asyncio.to_thread(cancel)
+        except Exception:
+            pass
+
+    async def _wait(self, job):
+        loop = asyncio.get_running_loop()
+        deadline = None if self.job_timeout is None else loop.time() + self.job_timeout
+        while True:
+            status = _status_name(await asyncio.to_thread(job.status))
+            if status == "FINISHED":
+                return
+            if status == "FAILED":
+                raise CloudJobError("Задание завершилось с ошибкой")
+            if deadline is not None and loop.time() >= deadline:
+                raise CloudJobError(f"Задание не завершилось за {self.job_timeout} с (статус {status})")
+            await asyncio.sleep(self.poll_interval)
+
+
+# ---- Локальная реализация сервиса на CPUQVM (для тестов и работы без облака) ----
+
+class _LocalResult:
+    def __init__(self, counts):
+        self.counts = counts
+
+    def get_counts(self):
+        return self.counts[0]
+
+    def get_counts_list(self):
+        return self.counts
+
+
+class _LocalJob:
+    def __init__(self, counts):
+        self._result = _LocalResult(counts)
+
+    def status(self):
+        return "FINISHED"
+
+    def result(self):
+        return self._result
+
+
+class _LocalBackend:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._simulator = None
+
+    def run(self, programs, shots, options=None):
+        from pyqpanda3.core import CPUQVM
+        if not isinstance(programs, list):
+            programs = [programs]
+        with self._lock:
+            if self._simulator is None:
+                self._simulator = CPUQVM()
+            counts = []
+            for program in programs:
+                self._simulator.run(program, shots)
+                counts.append(self._simulator.result().get_counts())
+        return _LocalJob(counts)
+
+
+class LocalCloudService:
+    def __init__(self, api_key=None):
+        self._backends = {}
+
+    def backends(self):
+        return list(self._backends) or ["full_amplitude"]
+
+    def backend(self, name):
+        if name not in self._backends:
+            self._backends[name] = _LocalBackend(name)
+        return self._backends[name]
@@ -0,0 +1,154 @@
+import math
+import os
+
+import numpy as np
+
+from qubits.gates import probabilities_of_one
+from qubits.instrumentation import metrics
+from qubits.remap import compile_packed_program, compile_qbit_program
+
+# Движок проверки — объект с методами count_ones(qbits, shots) и counts(qbit, shots).
+# count_ones возвращает массив количества единиц для каждого кубита,
+# counts — словарь в формате get_counts() для одного кубита.
+
+
+def counts_dict(shots, ones):
+    result = {}
+    if shots - ones:
+        result['0'] = int(shots - ones)
+    if ones:
+        result['1'] = int(ones)
+    return result
+
+
+#Аналитический движок: P(1) считается по списку вентилей, выборка — биномиальная
+class AnalyticEngine:
+    name = "analytic"
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def probabilities_of_one(self, qbits):
+        return probabilities_of_one(qbits)
+
+    def count_ones(self, qbits, shots):
+        with metrics.stage("simulate"):
+            ones = self.rng.binomial(shots, self.probabilities_of_one(qbits))
+        metrics.inc("shots", shots * len(ones), engine=self.name)
+        return ones
+
+    def counts(self, qbit, shots):
+        return counts_dict(shots, self.count_ones([qbit], shots)[0])
+
+
+#Сколько байт занимает одна амплитуда вектора состояния CPUQVM (complex128)
+AMPLITUDE_BYTES = 16
+#Дальше ~16 кубитов время на вектор состояния 2^k растёт быстрее, чем экономия на запусках
+MAX_BATCH_SIZE = 16
+
+
+#Доступная физическая память; если ОС не сообщает — считаем, что есть 1 ГиБ
+def available_memory():
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return 1 << 30
+
+
+#Подбор числа кубитов k в одной программе: вектор из 2^k амплитуд должен влезать в долю памяти
+def autotune_batch_size(memory_bytes=None, memory_fraction=0.25, max_batch_size=MAX_BATCH_SIZE):
+    if memory_bytes is None:
+        memory_bytes = available_memory()
+    budget = memory_bytes * memory_fraction / AMPLITUDE_BYTES
+    if budget < 2:
+        return 1
+    return max(1, min(max_batch_size, int(math.log2(budget))))
+
+
+#Разбор совместных результатов get_counts() по отдельным кубитам.
+#Классический бит i — i-й символ с конца строки результата
+def marginal_ones(joint_counts, size):
+    if not joint_counts:
+        return np.zeros(size, dtype=np.int64)
+    keys = "".join(key[::-1] for key in joint_counts).encode('ascii')
+    bits = (np.frombuffer(keys, dtype=np.uint8) - ord('0')).reshape(len(joint_counts), size)
+    counts = np.fromiter(joint_counts.values(), dtype=np.int64, count=len(joint_counts))
+    return counts @ bits.astype(np.int64)
+
+
+#Движок на симуляторе pyqpanda. batch_size — сколько кубитов упаковывать в одну программу:
+#1 — по запуску на кубит, "auto" — подобрать по памяти (autotune_batch_size)
+class QVMEngine:
+    name = "qvm"
+
+    def __init__(self, simulator, batch_size=1):
+        self.simulator = simulator
+        if batch_size == "auto":
+            batch_size = autotune_batch_size()
+        self.batch_size = max(1, int(batch_size))
+
+    def counts(self, qbit, shots):
+        with metrics.stage("build_program"):
+            program = compile_qbit_program(qbit)
+        return self._run(program, shots)
+
+    def _run(self, program, shots):
+        with metrics.stage("simulate"):
+            self.simulator.run(program, shots)
+            counts = self.simulator.result().get_counts()
+        metrics.inc("programs_run", engine=self.name)
+        metrics.inc("shots", shots, engine=self.name)
+        return counts
+
+    #Точные P(1): программа без измерения, вероятности берутся из вектора состояния
+    def probabilities_of_one(self, qbits):
+        qbits = list(qbits)
+        probabilities = np.zeros(len(qbits), dtype=np.float64)
+        for start in range(0, len(qbits), self.batch_size):
+            chunk = qbits[start:start + self.batch_size]
+            with metrics.stage("build_program"):
+                program = compile_packed_program(chunk, with_measure=False)
+            with metrics.stage("simulate"):
+                self.simulator.run(program, 1)
+                probs = np.asarray(self.simulator.result().get_prob_list(), dtype=np.float64)
+            metrics.inc("programs_run", engine=self.name)
+            states = np.arange(len(probs))
+            for offset in range(len(chunk)):
+                probabilities[start + offset] = probs[(states >> offset) & 1 == 1].sum()
+        return probabilities
+
+    def count_ones(self, qbits, shots):
+        if self.batch_size == 1:
+            return np.array([self.counts(qbit, shots).get('1', 0) for qbit in qbits], dtype=np.int64)
+        qbits = list(qbits)
+        ones = np.zeros(len(qbits), dtype=np.int64)
+        for start in range(0, len(qbits), self.batch_size):
+            chunk = qbits[start:start + self.batch_size]
+            with metrics.stage("build_program"):
+                program = compile_packed_program(chunk)
+            ones[start:start + len(chunk)] = marginal_ones(self._run(program, shots), len(chunk))
+        return ones
+
+
+#Если передан "голый" симулятор (CPUQVM) — оборачиваем его в QVMEngine
+def get_engine(simulator):
+    if hasattr(simulator, "count_ones"):
+        return simulator
+    return QVMEngine(simulator)
+
+
+#Создание движка по имени — нужно там, где движок собирается заново (например, в процессах-воркерах)
+def make_engine(name, **options):
+    if name == AnalyticEngine.name:
+        return AnalyticEngine(**options)
+    if name == QVMEngine.name:
+        from pyqpanda3.core import CPUQVM
+        return QVMEngine(CPUQVM(), **options)
+    if name == "cloud":
+        from qubits.cloud import CloudEngine
+        return CloudEngine(**options)
+    if name == "noisy":
+        from qubits.noise import NoiseModel, NoisyEngine
+        seed = options.pop("seed", None)
+        return NoisyEngine(NoiseModel(**options), seed=seed)
+    raise ValueError("Неизвестный движок проверки: " + str(name))
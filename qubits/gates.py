@@ -0,0 +1,71 @@
+import cmath
+import math
+
+import numpy as np
+
+# Записи вентилей хранятся как кортежи: ("RY", угол), ("RZ", угол), ("U3", θ, φ, λ) — углы в радианах.
+# Соглашения совпадают с pyqpanda: RY(θ) = exp(-iθY/2), RZ(φ) = exp(-iφZ/2),
+# U3 = [[cos(θ/2), -e^{iλ}sin(θ/2)], [e^{iφ}sin(θ/2), e^{i(φ+λ)}cos(θ/2)]]
+
+#Порог, ниже которого амплитуда считается нулевой
+EPS = 1e-12
+
+
+def ry_matrix(angle):
+    c = math.cos(angle / 2)
+    s = math.sin(angle / 2)
+    return ((c, -s), (s, c))
+
+
+def rz_matrix(angle):
+    return ((cmath.exp(-0.5j * angle), 0), (0, cmath.exp(0.5j * angle)))
+
+
+def u3_matrix(theta, phi, lam):
+    c = math.cos(theta / 2)
+    s = math.sin(theta / 2)
+    return ((c, -cmath.exp(1j * lam) * s), (cmath.exp(1j * phi) * s, cmath.exp(1j * (phi + lam)) * c))
+
+
+GATE_MATRICES = {
+    "RY": ry_matrix,
+    "RZ": rz_matrix,
+    "U3": u3_matrix,
+}
+
+
+def gate_matrix(gate):
+    name, *params = gate
+    return GATE_MATRICES[name](*params)
+
+
+#Состояние кубита (амплитуды |0⟩ и |1⟩) после применения списка вентилей к |0⟩
+def state_of(gates):
+    a, b = 1, 0
+    for gate in gates:
+        (m00, m01), (m10, m11) = gate_matrix(gate)
+        a, b = m00 * a + m01 * b, m10 * a + m11 * b
+    return a, b
+
+
+#Вероятность получить 1 при измерении в базисе Z
+def probability_of_one(gates):
+    _, b = state_of(gates)
+    return min(1.0, abs(b) ** 2)
+
+
+#Вентили, готовящие состояние a|0⟩ + b|1⟩ из |0⟩ (с точностью до глобальной фазы)
+def gates_for_state(a, b):
+    if abs(b) < EPS:
+        return []
+    theta = 2 * math.atan2(abs(b), abs(a))
+    phi = cmath.phase(b) - cmath.phase(a) if abs(a) >= EPS else 0.0
+    return [("U3", theta, phi, 0.0)]
+
+
+#То же самое для набора кубитов, результат — массив NumPy.
+#Пакеты кубитов (TokenBatch) считают вероятности сами, целым массивом
+def probabilities_of_one(qbits):
+    if hasattr(qbits, "probabilities_of_one"):
+        return qbits.probabilities_of_one()
+    return np.fromiter((probability_of_one(q.gates) for q in qbits), dtype=np.float64, count=len(qbits))
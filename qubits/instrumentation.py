@@ -0,0 +1,204 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import time
+
+# Инструментирование горячих путей: логгер, таймеры этапов, счётчики и гистограммы.
+#
+# По умолчанию сбор метрик выключен: stage() возвращает общий пустой контекст,
+# а inc()/observe() сразу выходят, так что в горячем цикле остаётся только вызов функции.
+# Сообщения о каждом кубите пишутся в логгер "qubits" на уровне DEBUG/INFO и без
+# настроенного logging никуда не выводятся.
+#
+# Включение без правки кода — через переменные окружения:
+#   QUBITS_METRICS=1               собирать метрики
+#   QUBITS_METRICS_JSONL=path      при выходе дописать снимок метрик строкой JSON
+#   QUBITS_METRICS_PROM=path       при выходе записать метрики в текстовом формате Prometheus
+#   QUBITS_LOG_LEVEL=DEBUG         уровень логгера "qubits" (с выводом в stderr)
+
+log = logging.getLogger("qubits")
+
+#Границы корзин гистограмм (секунды): от микросекунды до минуты
+DEFAULT_BUCKETS = (
+    1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0,
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "buckets": list(self.buckets), "counts": list(self.counts)}
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe("stage_seconds", time.perf_counter() - self.start, stage=self.name)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.histograms = {}
+        self.exporters = []
+
+    #Таймер этапа: with metrics.stage("spin"): ...
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self):
+        return {
+            "ts": time.time(),
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in self.counters.items()],
+            "histograms": [{"name": name, "labels": dict(labels), **histogram.to_dict()}
+                           for (name, labels), histogram in self.histograms.items()],
+        }
+
+    #Суммарное время и число вызовов по этапам — для отчётов бенчмарков
+    def stage_totals(self):
+        return {dict(labels)["stage"]: (histogram.sum, histogram.count)
+                for (name, labels), histogram in self.histograms.items() if name == "stage_seconds"}
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def export(self):
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            exporter.export(snapshot)
+
+
+#Снимок метрик дописывается в файл одной строкой JSON
+class JsonLinesExporter:
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, snapshot):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+
+
+def _prometheus_labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items.items()) + "}"
+
+
+#Метрики в текстовом формате Prometheus (файл перезаписывается, подходит для textfile collector)
+class PrometheusTextExporter:
+    def __init__(self, path, prefix="qtoken_"):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, snapshot):
+        lines = []
+        typed = set()
+        for counter in snapshot["counters"]:
+            name = self.prefix + counter["name"] + "_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_prometheus_labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot["histograms"]:
+            name = self.prefix + histogram["name"]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            labels = histogram["labels"]
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_prometheus_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_prometheus_labels(labels, le='+Inf')} {histogram['count']}")
+            lines.append(f"{name}_sum{_prometheus_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, snapshot):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(self.render(snapshot))
+
+
+metrics = Metrics()
+
+
+def configure_from_env(environ=os.environ):
+    level = environ.get("QUBITS_LOG_LEVEL")
+    if level:
+        log.setLevel(level.upper())
+        if not log.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            log.addHandler(handler)
+    if environ.get("QUBITS_METRICS_JSONL"):
+        metrics.add_exporter(JsonLinesExporter(environ["QUBITS_METRICS_JSONL"]))
+    if environ.get("QUBITS_METRICS_PROM"):
+        metrics.add_exporter(PrometheusTextExporter(environ["QUBITS_METRICS_PROM"]))
+    if environ.get("QUBITS_METRICS", "").lower() in ("1", "true", "yes") or metrics.exporters:
+        metrics.enabled = True
+    if metrics.exporters:
+        atexit.register(metrics.export)
+
+
+configure_from_env()
@@ -0,0 +1,86 @@
+from qubits.batch import KeyBatch
+
+# Хранилище приватных ключей для многих токенов одновременно.
+# Ключи лежат в словаре по id токена, внутри — словарь по id кубита,
+# поэтому поиск по (token_id, qbit_id) выполняется за O(1).
+# Пакет KeyBatch можно положить целиком: индекс id -> позиция строится при первом поиске.
+
+
+class PrivateKeyring:
+    def __init__(self):
+        self._tokens = {}
+        self._batches = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        token_id, qbit_id = key
+        return self.get(token_id, qbit_id) is not None
+
+    def has_token(self, token_id):
+        return token_id in self._tokens or token_id in self._batches
+
+    def token_ids(self):
+        return list(self._tokens.keys() | self._batches.keys())
+
+    def add(self, token_id, private_qbit):
+        self._materialize(token_id)
+        qbits = self._tokens.setdefault(token_id, {})
+        if private_qbit.id not in qbits:
+            self._size += 1
+        qbits[private_qbit.id] = private_qbit
+
+    #Массовая вставка: список PrivateQbit или KeyBatch
+    def add_many(self, token_id, private_qbits):
+        if isinstance(private_qbits, KeyBatch) and not self.has_token(token_id):
+            self._batches[token_id] = private_qbits
+            self._size += len(private_qbits)
+            return
+        for private_qbit in private_qbits:
+            self.add(token_id, private_qbit)
+
+    def get(self, token_id, qbit_id, default=None):
+        return self.keys_for(token_id).get(qbit_id, default)
+
+    #Словарь qbit_id -> приватный кубит для токена
+    def keys_for(self, token_id):
+        self._materialize(token_id)
+        return self._tokens.get(token_id, {})
+
+    #Ключи токена одним пакетом — для векторного спина по TokenBatch
+    def batch_for(self, token_id):
+        if token_id in self._batches:
+            return self._batches[token_id]
+        return KeyBatch.from_qbits(self.keys_for(token_id).values())
+
+    def remove(self, token_id, qbit_id):
+        qbits = self.keys_for(token_id)
+        if qbits.pop(qbit_id, None) is not None:
+            self._size -= 1
+        if not qbits:
+            self._tokens.pop(token_id, None)
+
+    #Удаление всех ключей токена, возвращает количество удалённых кубитов
+    def remove_token(self, token_id):
+        removed = 0
+        if token_id in self._batches:
+            removed += len(self._batches.pop(token_id))
+        removed += len(self._tokens.pop(token_id, {}))
+        self._size -= removed
+        return removed
+
+    def remove_tokens(self, token_ids):
+        return sum(self.remove_token(token_id) for token_id in token_ids)
+
+    def clear(self):
+        self._tokens.clear()
+        self._batches.clear()
+        self._size = 0
+
+    #Пакет превращается в словарь представлений только когда нужен поиск по одному кубиту
+    def _materialize(self, token_id):
+        batch = self._batches.pop(token_id, None)
+        if batch is not None:
+            self._tokens[token_id] = {view.id: view for view in batch}
@@ -0,0 +1,87 @@
+import numpy as np
+
+from qubits.batch import KeyBatch
+from qubits.instrumentation import metrics
+from qubits.keyring import PrivateKeyring
+from qubits.randomness import make_rng
+from qubits.storage import KIND_KEYS, StorageWriter
+
+# Массовый выпуск ключей: M токенов по N кубитов за один вызов.
+# Углы тянутся из источника (см. qubits.randomness) блоками по chunk_qubits кубитов
+# и сразу уходят в PrivateKeyring или в файл (qubits.storage), так что в памяти
+# одновременно лежит только один блок. Id кубитов внутри токена — 1..N, как
+# у generate_random_private_qbits, id токенов идут подряд с first_token_id.
+# С зерном выпуск воспроизводим при том же chunk_qubits: углы берутся блоками θ, затем φ.
+
+DEFAULT_CHUNK_QUBITS = 1 << 20
+
+
+#Блок выпуска: токены first_token_id.. подряд, углы формы (токенов, кубитов в токене)
+class MintChunk:
+    def __init__(self, first_token_id, theta, phi):
+        self.first_token_id = first_token_id
+        self.theta = theta
+        self.phi = phi
+
+    def __len__(self):
+        return len(self.theta)
+
+    @property
+    def token_ids(self):
+        return np.arange(self.first_token_id, self.first_token_id + len(self), dtype=np.int64)
+
+    @property
+    def qbit_ids(self):
+        return np.arange(1, self.theta.shape[1] + 1, dtype=np.int64)
+
+    #Ключи каждого токена — KeyBatch с копиями строк блока: представление строки держало бы
+    #в памяти весь блок, пока жив хоть один его токен
+    def key_batches(self):
+        ids = self.qbit_ids
+        for row, token_id in enumerate(self.token_ids.tolist()):
+            yield token_id, KeyBatch(ids, self.theta[row].copy(), self.phi[row].copy())
+
+
+def mint_chunks(number_of_tokens, number_of_qbits_in_token, rng=None,
+                chunk_qubits=DEFAULT_CHUNK_QUBITS, first_token_id=1):
+    rng = make_rng(rng)
+    tokens_per_chunk = max(1, chunk_qubits // number_of_qbits_in_token)
+    for start in range(0, number_of_tokens, tokens_per_chunk):
+        count = min(tokens_per_chunk, number_of_tokens - start)
+        shape = (count, number_of_qbits_in_token)
+        with metrics.stage("mint"):
+            theta = rng.uniform(0, 180, shape)
+            phi = rng.uniform(0, 360, shape)
+        metrics.inc("qubits_minted", count * number_of_qbits_in_token)
+        yield MintChunk(first_token_id + start, theta, phi)
+
+
+#Выпуск в связку ключей (новую, если не передана); ключи каждого токена ложатся одним KeyBatch
+def mint_to_keyring(number_of_tokens, number_of_qbits_in_token, keyring=None, rng=None,
+                    chunk_qubits=DEFAULT_CHUNK_QUBITS, first_token_id=1):
+    keyring = PrivateKeyring() if keyring is None else keyring
+    for chunk in mint_chunks(number_of_tokens, number_of_qbits_in_token, rng, chunk_qubits, first_token_id):
+        for token_id, keys in chunk.key_batches():
+            keyring.add_many(token_id, keys)
+    return keyring
+
+
+#Выпуск сразу в файл: destination — путь или открытый StorageWriter. Каждый блок — одна запись
+#на диск. Возвращает количество записанных кубитов
+def mint_to_file(destination, number_of_tokens, number_of_qbits_in_token, rng=None,
+                 chunk_qubits=DEFAULT_CHUNK_QUBITS, first_token_id=1, created=None):
+    own_writer = not isinstance(destination, StorageWriter)
+    writer = StorageWriter(destination, KIND_KEYS) if own_writer else destination
+    try:
+        for chunk in mint_chunks(number_of_tokens, number_of_qbits_in_token, rng, chunk_qubits, first_token_id):
+            writer.write_records(
+                np.repeat(chunk.token_ids, number_of_qbits_in_token),
+                np.tile(chunk.qbit_ids, len(chunk)),
+                chunk.theta.ravel(),
+                chunk.phi.ravel(),
+                created,
+            )
+    finally:
+        if own_writer:
+            writer.close()
+    return number_of_tokens * number_of_qbits_in_token
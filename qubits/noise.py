@@ -0,0 +1,184 @@
+import numpy as np
+
+from qubits.batch import TokenBatch
+from qubits.engines import counts_dict
+from qubits.instrumentation import metrics
+
+# Шумная пакетная модель для токенов из независимых кубитов (состояние — произведение
+# однокубитных). Каждый кубит описывается матрицей плотности 2x2, все кубиты лежат
+# в одном массиве (n, 2, 2), и каждый слой вентилей со следующим за ним шумом
+# применяется ко всему массиву сразу:
+#   ρ -> U ρ U†                                  вентиль слоя (кубиты без вентиля — I)
+#   ρ -> (1 - p) ρ + p I/2                       деполяризация с вероятностью p
+#   ρ00 += γ ρ11, ρ11 *= 1 - γ, ρ01 *= √(1 - γ)  затухание амплитуды γ
+# Шум действует только на кубиты, у которых в слое есть вентиль. Схема кубита хранится
+# свёрнутой (спин и обратный спин — пустая схема), а устройство выполняет все физические
+# вентили, поэтому кубит получает по шумному слою на каждый вентиль из depth
+# (PublicQbit.depth, TokenBatch.depth): вентили свёрнутой схемы — со своим шумом, остальные
+# depth - len(gates) — шумными слоями после них. Деполяризация перестановочна с вентилями
+# и так учитывается точно, затухание амплитуды — приближённо. idle_layers добавляет всем
+# кубитам ещё столько шумных слоёв без вентилей (простой, задержки считывания).
+# При считывании 0 читается как 1 с вероятностью readout_error_0, 1 как 0 — readout_error_1.
+
+
+class NoiseModel:
+    def __init__(self, depolarizing=0.0, amplitude_damping=0.0, readout_error_0=0.0, readout_error_1=0.0,
+                 idle_layers=0):
+        for value in (depolarizing, amplitude_damping, readout_error_0, readout_error_1):
+            if not 0.0 <= value <= 1.0:
+                raise ValueError("Вероятности шума должны быть в [0, 1]: " + str(value))
+        self.depolarizing = depolarizing
+        self.amplitude_damping = amplitude_damping
+        self.readout_error_0 = readout_error_0
+        self.readout_error_1 = readout_error_1
+        self.idle_layers = idle_layers
+
+    def to_dict(self):
+        return {
+            "depolarizing": self.depolarizing,
+            "amplitude_damping": self.amplitude_damping,
+            "readout_error_0": self.readout_error_0,
+            "readout_error_1": self.readout_error_1,
+            "idle_layers": self.idle_layers,
+        }
+
+    #Канал шума после вентиля для кубитов с маской active (по месту)
+    def apply_gate_noise(self, rho, active=slice(None)):
+        if self.depolarizing:
+            p = self.depolarizing
+            part = rho[active]
+            trace = part[:, 0, 0] + part[:, 1, 1]
+            part *= 1 - p
+            part[:, 0, 0] += p * trace / 2
+            part[:, 1, 1] += p * trace / 2
+            rho[active] = part
+        if self.amplitude_damping:
+            gamma = self.amplitude_damping
+            part = rho[active]
+            part[:, 0, 0] += gamma * part[:, 1, 1]
+            part[:, 1, 1] *= 1 - gamma
+            part[:, 0, 1] *= np.sqrt(1 - gamma)
+            part[:, 1, 0] *= np.sqrt(1 - gamma)
+            rho[active] = part
+
+    #P(прочитать 1) по P(1) в состоянии
+    def apply_readout(self, p_one):
+        return p_one * (1 - self.readout_error_1) + (1 - p_one) * self.readout_error_0
+
+
+#Векторные матрицы вентилей (k, 2, 2) в соглашениях qubits.gates
+def _ry(angle):
+    c = np.cos(angle / 2)
+    s = np.sin(angle / 2)
+    return np.stack([np.stack([c, -s], -1), np.stack([s, c], -1)], -2).astype(np.complex128)
+
+
+def _rz(angle):
+    zero = np.zeros_like(angle, dtype=np.complex128)
+    return np.stack([np.stack([np.exp(-0.5j * angle), zero], -1), np.stack([zero, np.exp(0.5j * angle)], -1)], -2)
+
+
+def _u3(theta, phi, lam):
+    c = np.cos(theta / 2)
+    s = np.sin(theta / 2)
+    return np.stack([
+        np.stack([c + 0j, -np.exp(1j * lam) * s], -1),
+        np.stack([np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c], -1),
+    ], -2)
+
+
+_BUILDERS = {"RY": _ry, "RZ": _rz, "U3": _u3}
+
+#Физических вентилей у честного кубита: спин (RY, RZ) и обратный спин (RZ, RY)
+TOKEN_GATE_DEPTH = 4
+
+
+#Слои вентилей: layers[k] — список (позиция кубита, вентиль) для k-го вентиля каждого кубита
+def _gate_layers(qbits):
+    layers = []
+    for position, qbit in enumerate(qbits):
+        for depth, gate in enumerate(qbit.gates):
+            if depth == len(layers):
+                layers.append([])
+            layers[depth].append((position, gate))
+    return layers
+
+
+#Матрицы одного слоя: вентили группируются по имени и строятся одним вызовом на группу
+def _layer_unitaries(layer):
+    positions = np.fromiter((position for position, _ in layer), dtype=np.int64, count=len(layer))
+    unitaries = np.empty((len(layer), 2, 2), dtype=np.complex128)
+    by_name = {}
+    for index, (_, (name, *params)) in enumerate(layer):
+        by_name.setdefault(name, ([], []))
+        by_name[name][0].append(index)
+        by_name[name][1].append(params)
+    for name, (indices, params) in by_name.items():
+        params = np.asarray(params, dtype=np.float64)
+        unitaries[indices] = _BUILDERS[name](*params.T)
+    return positions, unitaries
+
+
+def _apply_unitaries(rho, positions, unitaries):
+    part = rho[positions]
+    rho[positions] = unitaries @ part @ np.conj(np.swapaxes(unitaries, -1, -2))
+
+
+class NoisyEngine:
+    def __init__(self, noise=None, seed=None):
+        self.noise = noise if noise is not None else NoiseModel()
+        self.rng = np.random.default_rng(seed)
+        # имя входит в ключ CachedEngine, поэтому в нём параметры шума
+        params = ",".join(f"{key}={value}" for key, value in self.noise.to_dict().items())
+        self.name = f"noisy({params})"
+
+    #Матрицы плотности всех кубитов после их вентилей и шума
+    def density_matrices(self, qbits):
+        with metrics.stage("simulate"):
+            if isinstance(qbits, TokenBatch):
+                return self._density_from_states(qbits)
+            rho = np.zeros((len(qbits), 2, 2), dtype=np.complex128)
+            rho[:, 0, 0] = 1
+            for layer in _gate_layers(qbits):
+                positions, unitaries = _layer_unitaries(layer)
+                _apply_unitaries(rho, positions, unitaries)
+                self.noise.apply_gate_noise(rho, positions)
+            fused = np.fromiter((len(qbit.gates) for qbit in qbits), dtype=np.int64, count=len(qbits))
+            depth = np.fromiter((getattr(qbit, "depth", len(qbit.gates)) for qbit in qbits), dtype=np.int64,
+                                count=len(qbits))
+            self._apply_layers(rho, depth - fused)
+            self._apply_idle(rho)
+            return rho
+
+    #TokenBatch хранит чистые состояния после всех вентилей; шум — по depth каждого кубита
+    def _density_from_states(self, batch):
+        state = batch.state
+        rho = state[:, :, None] * np.conj(state[:, None, :])
+        self._apply_layers(rho, batch.depth)
+        self._apply_idle(rho)
+        return rho
+
+    #layers[i] шумных слоёв для i-го кубита
+    def _apply_layers(self, rho, layers):
+        for layer in range(int(layers.max(initial=0))):
+            self.noise.apply_gate_noise(rho, layers > layer)
+
+    def _apply_idle(self, rho):
+        for _ in range(self.noise.idle_layers):
+            self.noise.apply_gate_noise(rho)
+
+    #Вероятность прочитать 1 с учётом ошибок считывания
+    def probabilities_of_one(self, qbits):
+        rho = self.density_matrices(qbits)
+        p_one = np.clip(rho[:, 1, 1].real, 0.0, 1.0)
+        return self.noise.apply_readout(p_one)
+
+    def count_ones(self, qbits, shots):
+        probabilities = self.probabilities_of_one(qbits)
+        with metrics.stage("simulate"):
+            ones = self.rng.binomial(shots, probabilities)
+        metrics.inc("shots", shots * len(ones), engine="noisy")
+        return ones
+
+    def counts(self, qbit, shots):
+        return counts_dict(shots, self.count_ones([qbit], shots)[0])
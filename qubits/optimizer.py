@@ -0,0 +1,57 @@
+import cmath
+import math
+
+from qubits.gates import EPS, gate_matrix
+
+# Оптимизация однокубитных схем. Любая цепочка RY/RZ/U3 на одном кубите — это одна унитарная
+# матрица 2x2, поэтому схема хранится как накопленная матрица и выдаётся в канонической
+# минимальной форме: пустой список, если матрица единичная с точностью до глобальной фазы
+# (например, спин и следом обратный спин), иначе один вентиль U3.
+# Длина схемы, а значит и стоимость измерения, не растёт с числом циклов спин/обратный спин.
+
+IDENTITY = ((1, 0), (0, 1))
+
+
+def multiply(left, right):
+    (a00, a01), (a10, a11) = left
+    (b00, b01), (b10, b11) = right
+    return (
+        (a00 * b00 + a01 * b10, a00 * b01 + a01 * b11),
+        (a10 * b00 + a11 * b10, a10 * b01 + a11 * b11),
+    )
+
+
+#Приведение угла к интервалу (-π, π]
+def wrap_angle(angle):
+    angle = math.remainder(angle, 2 * math.pi)
+    return math.pi if angle == -math.pi else angle
+
+
+#Матрица всей цепочки вентилей (вентили применяются слева направо)
+def unitary_of(gates, unitary=IDENTITY):
+    for gate in gates:
+        unitary = multiply(gate_matrix(gate), unitary)
+    return unitary
+
+
+#Каноническая форма матрицы: [] для единичной, иначе [("U3", θ, φ, λ)]
+def canonical_gates(unitary):
+    (u00, u01), (u10, u11) = unitary
+    c = abs(u00)
+    s = abs(u10)
+    if s < EPS:
+        lam = wrap_angle(cmath.phase(u11) - cmath.phase(u00))
+        if abs(lam) < EPS:
+            return []
+        return [("U3", 0.0, 0.0, lam)]
+    theta = 2 * math.atan2(s, c)
+    if c < EPS:
+        alpha = cmath.phase(-u01)
+        return [("U3", theta, wrap_angle(cmath.phase(u10) - alpha), 0.0)]
+    alpha = cmath.phase(u00)
+    return [("U3", theta, wrap_angle(cmath.phase(u10) - alpha), wrap_angle(cmath.phase(-u01) - alpha))]
+
+
+#Сжатие произвольного списка вентилей до канонической формы
+def optimize_gates(gates):
+    return canonical_gates(unitary_of(gates))
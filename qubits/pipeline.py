@@ -0,0 +1,193 @@
+import asyncio
+import math
+import time
+
+from qubits.batch import generate_random_key_batch
+from qubits.instrumentation import metrics
+from qubits.qubit_func import Token, measure_token
+from qubits.randomness import make_rng
+
+# Потоковый конвейер токенов на asyncio. Каждый этап — функция item -> item
+# (None — элемент отбрасывается) со своей ограниченной очередью на входе:
+# когда следующий этап не успевает, put() в его очередь ждёт, и задержка
+# доходит до источника (backpressure). Поэтому в работе одновременно не больше
+# суммы размеров очередей элементов, и память не растёт с длиной потока.
+# Блокирующие этапы (blocking=True, например проверка на симуляторе) выполняются
+# в потоке через asyncio.to_thread, чтобы соседние этапы шли параллельно с ними.
+#
+# По каждому этапу считается StageStats: элементы, время работы, время ожидания
+# входа и выхода (простой и backpressure), пропускная способность.
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.wait_input = 0.0
+        self.wait_output = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def wall(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    #Элементов в секунду от начала работы этапа
+    @property
+    def throughput(self):
+        return self.items / self.wall if self.wall > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy": self.busy,
+            "wait_input": self.wait_input,
+            "wait_output": self.wait_output,
+            "wall": self.wall,
+            "throughput": self.throughput,
+        }
+
+
+class Stage:
+    def __init__(self, name, fn, buffer=8, blocking=False):
+        self.name = name
+        self.fn = fn
+        self.buffer = buffer
+        self.blocking = blocking
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.stats = {stage.name: StageStats(stage.name) for stage in self.stages}
+
+    #Прогон источника (обычный или асинхронный итератор) через все этапы,
+    #возвращает количество элементов, прошедших последний этап
+    async def run(self, source):
+        queues = [asyncio.Queue(maxsize=stage.buffer) for stage in self.stages]
+        queues.append(None)
+        tasks = [asyncio.create_task(self._feed(source, queues[0]))]
+        tasks += [
+            asyncio.create_task(self._work(stage, queues[index], queues[index + 1]))
+            for index, stage in enumerate(self.stages)
+        ]
+        # ошибка любого этапа сразу прерывает прогон: остальные задачи иначе ждали бы
+        # места в очереди, которую уже никто не разбирает
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.stats[self.stages[-1].name].items
+
+    def run_sync(self, source):
+        return asyncio.run(self.run(source))
+
+    async def _feed(self, source, queue):
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                await queue.put(item)
+        else:
+            for item in source:
+                await queue.put(item)
+        await queue.put(_DONE)
+
+    async def _work(self, stage, inbox, outbox):
+        stats = self.stats[stage.name]
+        stats.started = time.perf_counter()
+        while True:
+            waited = time.perf_counter()
+            item = await inbox.get()
+            started = time.perf_counter()
+            stats.wait_input += started - waited
+            if item is _DONE:
+                break
+
+            if stage.blocking:
+                result = await asyncio.to_thread(stage.fn, item)
+            else:
+                result = stage.fn(item)
+            finished = time.perf_counter()
+            stats.busy += finished - started
+            stats.items += 1
+            metrics.inc("pipeline_items", stage=stage.name)
+            metrics.observe("pipeline_item_seconds", finished - started, stage=stage.name)
+
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+                stats.wait_output += time.perf_counter() - finished
+        if outbox is not None:
+            await outbox.put(_DONE)
+        stats.finished = time.perf_counter()
+
+    def report(self):
+        return [self.stats[stage.name].to_dict() for stage in self.stages]
+
+
+#Элемент потока токенов: ключи, публичные кубиты, сам токен и результат проверки
+class TokenJob:
+    __slots__ = ("token_id", "keys", "public", "token", "ok")
+
+    def __init__(self, token_id):
+        self.token_id = token_id
+        self.keys = None
+        self.public = None
+        self.token = None
+        self.ok = None
+
+
+#Стандартная цепочка mint -> publish -> spin -> reverse -> verify -> record на пакетах
+#KeyBatch/TokenBatch. record(job) получает проверенный токен; после него ссылки на
+#ключи и кубиты отпускаются, так что в памяти остаются только элементы в очередях.
+#Источник углов создаётся один раз на весь поток: с зерном токены воспроизводимы, но разные
+def token_stages(engine, qubits, shots, permissible, record=None, rng=None, buffer=8):
+    rng = make_rng(rng)
+
+    def mint(job):
+        job.keys = generate_random_key_batch(qubits, rng)
+        return job
+
+    def publish(job):
+        job.public = job.keys.make_public()
+        job.token = Token(job.token_id, job.public, ttl=math.inf)
+        return job
+
+    def spin(job):
+        job.public.make_spin_from_keys(job.keys)
+        return job
+
+    def reverse(job):
+        job.public.make_reverse_spin_from_keys(job.keys)
+        return job
+
+    def verify(job):
+        job.ok = measure_token(engine, job.token, shots, permissible)
+        return job
+
+    def finish(job):
+        if record is not None:
+            record(job)
+        job.keys = job.public = job.token = None
+        return job
+
+    return [
+        Stage("mint", mint, buffer),
+        Stage("publish", publish, buffer),
+        Stage("spin", spin, buffer),
+        Stage("reverse", reverse, buffer),
+        Stage("verify", verify, buffer, blocking=True),
+        Stage("record", finish, buffer),
+    ]
+
+
+#Непрерывный поток из number_of_tokens токенов; возвращает конвейер (для report())
+def run_token_stream(number_of_tokens, engine, qubits, shots, permissible, record=None, rng=None, buffer=8):
+    pipeline = Pipeline(token_stages(engine, qubits, shots, permissible, record, rng, buffer))
+    pipeline.run_sync(TokenJob(token_id) for token_id in range(1, number_of_tokens + 1))
+    return pipeline
@@ -1,7 +1,15 @@
-from pyqpanda3.core import *
 from datetime import datetime
-import random
 import math
+import time
+
+from qubits.batch import KeyBatch, TokenBatch
+from qubits.engines import get_engine
+from qubits.instrumentation import log, metrics
+from qubits.keyring import PrivateKeyring
+from qubits.optimizer import IDENTITY, canonical_gates, unitary_of
+from qubits.randomness import system_random
+from qubits.remap import compile_circuit
+from qubits.sequential import SequentialTest
 
 #Приватный токен - класс, который содержит "инструкцию", как приготовить кубит.
 class PrivateQbit:
@@ -10,51 +18,77 @@ class PrivateQbit:
         self.theta = theta
         self.phi = phi
         self.tag = tag
-        self.circuit = QCircuit()
+        self.gates = []
         self.public_qbit = PublicQbit(self.id)
 
+    #Схема собирается по требованию, чтобы создание ключей не тянуло pyqpanda
+    @property
+    def circuit(self):
+        return compile_circuit(self.gates, self.id)
+
 #Класс, содержащий только суперпозицию. Набор объектов данного класса будут составлять токен
+#Вентили не копятся списком: кубит хранит их произведение и отдаёт схему в минимальной
+#форме (см. qubits.optimizer), поэтому спин + обратный спин сворачиваются в пустую схему.
+#depth — сколько физических вентилей было применено (на устройстве схема не сворачивается)
 class PublicQbit:
     def __init__(self, id, tag=None):
         self.id = id
         self.tag = tag
-        self.circuit = QCircuit()
+        self.unitary = IDENTITY
+        self._gates = []
+        self.depth = 0
+
+    #Вентили в канонической форме — по ним строятся программы для измерения
+    @property
+    def gates(self):
+        return self._gates
+
+    #Схема на виртуальном кубите id (для отображения, измерение идёт через qubits.remap)
+    @property
+    def circuit(self):
+        return compile_circuit(self._gates, self.id)
+
+    def append_gates(self, gates):
+        self.unitary = unitary_of(gates, self.unitary)
+        self._gates = canonical_gates(self.unitary)
+        self.depth += len(gates)
+        if not self._gates:
+            self.unitary = IDENTITY  # сбрасываем накопленную погрешность округления
 
     def make_spin(self, theta, phi):
-        self.circuit << RY(self.id, math.radians(theta)) # θ влияет на P(0)/P(1) в Z
-        self.circuit << RZ(self.id, math.radians(phi))   # φ задаёт фазу, в Z не видно
-        print(theta, phi)
-        print("Выполнен спин на публичном кубите с id: "+str(self.id))
+        self.append_gates([
+            ("RY", math.radians(theta)),  # θ влияет на P(0)/P(1) в Z
+            ("RZ", math.radians(phi)),    # φ задаёт фазу, в Z не видно
+        ])
+        log.debug("Выполнен спин на публичном кубите с id: %s (θ=%s, φ=%s)", self.id, theta, phi)
 
     def make_reverse_spin(self, theta, phi):
-        self.circuit << RZ(self.id, math.radians(-phi))   # φ задаёт фазу, в Z не видно
-        self.circuit << RY(self.id, math.radians(-theta)) # θ влияет на P(0)/P(1) в Z
-        print("Выполнен обратный спин на публичном кубите с id: "+str(self.id))
+        self.append_gates([
+            ("RZ", math.radians(-phi)),   # φ задаёт фазу, в Z не видно
+            ("RY", math.radians(-theta)), # θ влияет на P(0)/P(1) в Z
+        ])
+        log.debug("Выполнен обратный спин на публичном кубите с id: %s", self.id)
 
 #Создание массива приватных кубитов с рандомными углами
 def generate_random_private_qbits(number_of_qbits_in_token):
-    resultArray = []
-    for i in range(number_of_qbits_in_token):
-        private_qbit = PrivateQbit(i+1, get_random_theta(), get_random_phi())
-        resultArray.append(private_qbit)
+    with metrics.stage("mint"):
+        resultArray = []
+        for i in range(number_of_qbits_in_token):
+            private_qbit = PrivateQbit(i+1, get_random_theta(), get_random_phi())
+            resultArray.append(private_qbit)
+    metrics.inc("qubits_minted", number_of_qbits_in_token)
     return resultArray
 
-#Функции для генерации случайных углов тета и фи
+#Функции для генерации случайных углов тета и фи (углы — секрет ключа, источник криптостойкий)
 def get_random_theta():
-    return random.uniform(0, 180)
+    return system_random.uniform(0, 180)
 
 def get_random_phi():
-    return random.uniform(0, 360)
+    return system_random.uniform(0, 360)
 
 #Функция для измерения состояния кубита
 def measure_qbit(simulator, qbit, number_of_measures_of_single_qbit):
-    program = QProg() << qbit.circuit << measure(qbit.id, 0)    #qbit.id)
-    simulator.run(program, number_of_measures_of_single_qbit)
-    result = simulator.result().get_counts()
-    #print("Кубит с id "+str(qbit.id))
-    #print(result)
-    ones = result.get('1', 0)
-    #print("Количество единиц:", ones)
+    result = get_engine(simulator).counts(qbit, number_of_measures_of_single_qbit)
     return result
 
 #Создание массива публичных кубитов на основе приватных
@@ -66,56 +100,107 @@ def make_public_qbits_array(private_qbits_array: list):
 
 #Функция для измерения состояния кубита
 def measureQbit(simulator, qbit, number_of_measures_of_single_qbit):
-    programm = QProg() << qbit.circuit << measure(qbit.id, 0)    #qbit.id)
-    simulator.run(programm, number_of_measures_of_single_qbit)
-    result = simulator.result().get_counts()
-    print("Кубит с id "+str(qbit.id))
-    ones = result.get('1', 0)
-    print("Количество единиц:", ones)
+    result = get_engine(simulator).counts(qbit, number_of_measures_of_single_qbit)
+    log.info("Кубит с id %s", qbit.id)
+    log.info("Количество единиц: %s", result.get('1', 0))
     return result
 
 #Функция для поиска приватного кубита в массиве по его айди(используется чтобы публичный кубит нашел свой приватный во время проверки токена)
-def find_private_qbit_by_id(private_qbits, id):
+#Вместо массива можно передать PrivateKeyring — тогда нужен и id токена
+def find_private_qbit_by_id(private_qbits, id, token_id=None):
+    if isinstance(private_qbits, PrivateKeyring):
+        return _find_in_index(private_qbits.keys_for(token_id), id)
     for el in private_qbits:
         if el.id == id:
             return el
-    print("Кубит с таким айди не найден")
+    log.warning("Кубит с айди %s не найден", id)
     return None
 
+#Для токена-пакета (TokenBatch) спин делается сразу по всему массиву
+def _as_key_batch(token, private_qbits):
+    if isinstance(private_qbits, KeyBatch):
+        return private_qbits
+    if isinstance(private_qbits, PrivateKeyring):
+        return private_qbits.batch_for(token.id)
+    return KeyBatch.from_qbits(private_qbits)
+
+#Индекс id -> приватный кубит, строится один раз на проход по токену
+def _index_private_qbits(token, private_qbits):
+    if isinstance(private_qbits, PrivateKeyring):
+        return private_qbits.keys_for(token.id)
+    return {el.id: el for el in private_qbits}
+
+def _find_in_index(index, id):
+    el = index.get(id)
+    if el is None:
+        log.warning("Кубит с айди %s не найден", id)
+    return el
+
 #Сделать спин/задать суперпозицию на всех кубитах в токене
 def make_spin_for_all_qbits_in_token(token, private_qbits):
-    for public_qbit in token.array_of_public_qbits:
-        private_qbit = find_private_qbit_by_id(private_qbits, public_qbit.id)
-        public_qbit.make_spin(private_qbit.theta, private_qbit.phi)
+    with metrics.stage("spin"):
+        if isinstance(token.array_of_public_qbits, TokenBatch):
+            token.array_of_public_qbits.make_spin_from_keys(_as_key_batch(token, private_qbits))
+        else:
+            index = _index_private_qbits(token, private_qbits)
+            for public_qbit in token.array_of_public_qbits:
+                private_qbit = _find_in_index(index, public_qbit.id)
+                public_qbit.make_spin(private_qbit.theta, private_qbit.phi)
+    metrics.inc("qubits_spun", len(token.array_of_public_qbits))
 
 #Функция обратного спина для проверки токена
 def reverse_qbits_in_token(token, private_qbits):
-    for publicQbit in token.array_of_public_qbits:
-        private_qbit = find_private_qbit_by_id(private_qbits, publicQbit.id)
-        publicQbit.make_reverse_spin(private_qbit.theta, private_qbit.phi)
+    with metrics.stage("reverse"):
+        if isinstance(token.array_of_public_qbits, TokenBatch):
+            token.array_of_public_qbits.make_reverse_spin_from_keys(_as_key_batch(token, private_qbits))
+        else:
+            index = _index_private_qbits(token, private_qbits)
+            for publicQbit in token.array_of_public_qbits:
+                private_qbit = _find_in_index(index, publicQbit.id)
+                publicQbit.make_reverse_spin(private_qbit.theta, private_qbit.phi)
+    metrics.inc("qubits_reversed", len(token.array_of_public_qbits))
+
+#Истёк ли срок жизни токена. Отсчёт идёт по монотонным часам — перевод системного
+#времени не продлевает и не обрывает жизнь токена
+def is_token_expired(token, now=None):
+    now = time.monotonic() if now is None else now
+    return now - token.monotonic_time_of_creation > token.ttl
 
 #Функция для измерения состояний кубитов токена
+#Вместо симулятора можно передать движок проверки (например, AnalyticEngine из qubits.engines)
 def measure_token(simulator, token, number_of_measures_of_single_qbit, permissible_number_of_ones):
-    if((datetime.now() - token.time_of_creation).total_seconds() > token.ttl):
+    if is_token_expired(token):
+        metrics.inc("tokens_verified", result="expired")
         return False
-    success = True
-    for qbit in token.array_of_public_qbits:
-        programm = QProg() << qbit.circuit << measure(qbit.id, 0)    #qbit.id)
-        simulator.run(programm, number_of_measures_of_single_qbit)
-        result = simulator.result().get_counts()
-        #print("Кубит с id "+str(qbit.id))
-        #print(result)
-        ones = result.get('1', 0)
-        #print("Количество единиц:", ones)
-        if ones > permissible_number_of_ones:
-            success = False
+    engine = get_engine(simulator)
+    ones = engine.count_ones(token.array_of_public_qbits, number_of_measures_of_single_qbit)
+    with metrics.stage("decide"):
+        success = not bool((ones > permissible_number_of_ones).any())
+    metrics.inc("tokens_verified", result="ok" if success else "fail")
     return success
 
+#Последовательная проверка токена: выстрелы берутся порциями по step, каждый кубит
+#останавливается, как только решение статистически определено (см. qubits.sequential).
+#number_of_measures_of_single_qbit — верхняя граница выстрелов на кубит
+def measure_token_sequential(simulator, token, number_of_measures_of_single_qbit, permissible_number_of_ones,
+                             alpha=1e-3, beta=1e-3, forged_rate=0.05, step=32):
+    if is_token_expired(token):
+        return False
+    test = SequentialTest(number_of_measures_of_single_qbit, permissible_number_of_ones,
+                          alpha=alpha, beta=beta, forged_rate=forged_rate, step=step)
+    success, _ = test.run(get_engine(simulator), token.array_of_public_qbits)
+    return success
+
+#Срок жизни токена по умолчанию, секунды
+DEFAULT_TOKEN_TTL = 5
+
 #Класс, описывающий токен
+#time_of_creation — для отображения и хранения, срок жизни считается от monotonic_time_of_creation
 class Token:
-    def __init__(self, id, array_of_public_qbits, tag=None):
+    def __init__(self, id, array_of_public_qbits, tag=None, ttl=DEFAULT_TOKEN_TTL):
         self.time_of_creation = datetime.now()
-        self.ttl = 5
+        self.monotonic_time_of_creation = time.monotonic()
+        self.ttl = ttl
         self.id = id
         self.array_of_public_qbits = array_of_public_qbits
         self.tag = tag
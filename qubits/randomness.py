@@ -0,0 +1,33 @@
+import os
+import random
+
+import numpy as np
+
+# Источник случайных углов для ключей. По умолчанию — криптографически стойкий
+# (os.urandom), целыми массивами: 8 случайных байт -> 53 бита мантиссы -> [0, 1).
+# Для воспроизводимых бенчмарков вместо него можно передать numpy.random.Generator
+# или целое зерно: у обоих один и тот же интерфейс uniform(low, high, size).
+
+#Для одиночных значений (объектный путь generate_random_private_qbits)
+system_random = random.SystemRandom()
+
+
+class SecureRandom:
+    #Равномерные числа в [0, 1) формы size
+    def random(self, size=None):
+        count = 1 if size is None else int(np.prod(size))
+        raw = np.frombuffer(os.urandom(8 * count), dtype="<u8")
+        values = (raw >> 11) * (1.0 / (1 << 53))
+        return float(values[0]) if size is None else values.reshape(size)
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        return low + (high - low) * self.random(size)
+
+
+#None -> SecureRandom, int -> numpy.random.Generator с этим зерном, иначе сам объект
+def make_rng(rng=None):
+    if rng is None:
+        return SecureRandom()
+    if isinstance(rng, (int, np.integer)):
+        return np.random.default_rng(rng)
+    return rng
@@ -0,0 +1,103 @@
+import heapq
+import itertools
+import time
+
+from qubits.instrumentation import metrics
+from qubits.keyring import PrivateKeyring
+from qubits.qubit_func import DEFAULT_TOKEN_TTL, Token
+
+# Реестр живых токенов. Токены лежат в словаре по id (поиск за O(1)),
+# а моменты истечения — в куче, поэтому expire() снимает с вершины только
+# истёкшие токены и не просматривает живые. Вместе с токеном из связки
+# удаляются его приватные ключи.
+# Время — монотонные часы clock (те же, что у is_token_expired по умолчанию).
+# expire() вызывается при каждой выдаче, так что при непрерывном выпуске
+# короткоживущих токенов в памяти остаются только непросроченные.
+
+
+class TokenRegistry:
+    def __init__(self, keyring=None, default_ttl=DEFAULT_TOKEN_TTL, clock=time.monotonic):
+        self.keyring = keyring if keyring is not None else PrivateKeyring()
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._tokens = {}
+        self._expires = {}
+        self._heap = []
+        self._token_ids = itertools.count(1)
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, token_id):
+        return self.get(token_id) is not None
+
+    #Выпуск токена с новым id: публичные кубиты (список или TokenBatch) и, если есть, ключи к ним
+    def issue(self, array_of_public_qbits, keys=None, ttl=None, tag=None):
+        token = Token(next(self._token_ids), array_of_public_qbits, tag=tag,
+                      ttl=self.default_ttl if ttl is None else ttl)
+        return self.register(token, keys)
+
+    #Регистрация готового токена; срок жизни отсчитывается с момента регистрации
+    def register(self, token, keys=None):
+        now = self.clock()
+        self.expire(now)
+        if token.id in self._tokens:
+            raise ValueError("Токен с id " + str(token.id) + " уже зарегистрирован")
+
+        token.monotonic_time_of_creation = now
+        expires = now + token.ttl
+        self._tokens[token.id] = token
+        self._expires[token.id] = expires
+        heapq.heappush(self._heap, (expires, token.id))
+        if keys is not None:
+            self.keyring.add_many(token.id, keys)
+        metrics.inc("tokens_issued")
+        return token
+
+    #Токен по id; истёкший считается отсутствующим, даже если expire() его ещё не снял
+    def get(self, token_id, default=None):
+        expires = self._expires.get(token_id)
+        if expires is None or expires < self.clock():
+            return default
+        return self._tokens[token_id]
+
+    #Досрочный отзыв токена вместе с ключами
+    def revoke(self, token_id):
+        if self._tokens.pop(token_id, None) is None:
+            return False
+        del self._expires[token_id]
+        self.keyring.remove_token(token_id)
+        self._compact()
+        return True
+
+    #Снятие всех истёкших к моменту now токенов, возвращает их id
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] < now:
+            expires, token_id = heapq.heappop(self._heap)
+            # запись могла устареть: токен отозван или id зарегистрирован заново
+            if self._expires.get(token_id) != expires:
+                continue
+            del self._tokens[token_id]
+            del self._expires[token_id]
+            expired.append(token_id)
+        if expired:
+            self.keyring.remove_tokens(expired)
+            self.expired += len(expired)
+            metrics.inc("tokens_expired", len(expired))
+        return expired
+
+    #Записи отозванных токенов остаются в куче до своего срока; если их стало больше,
+    #чем живых, куча пересобирается, чтобы память не росла при массовом отзыве
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._tokens) + 64:
+            self._heap = [(expires, token_id) for token_id, expires in self._expires.items()]
+            heapq.heapify(self._heap)
+
+    def clear(self):
+        self.keyring.remove_tokens(list(self._tokens))
+        self._tokens.clear()
+        self._expires.clear()
+        self._heap.clear()
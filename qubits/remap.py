@@ -0,0 +1,45 @@
+# Слой переназначения: вентили публичного кубита записаны на его виртуальном индексе (qbit.id),
+# а для измерения переносятся на локальный физический индекс. Так размер регистра
+# симулятора не зависит от id кубита.
+# pyqpanda3 импортируется при первой сборке схемы: генерация ключей и аналитическая
+# проверка его не требуют, а сам импорт занимает больше секунды.
+
+#Имена конструкторов вентилей в pyqpanda3.core
+GATE_BUILDERS = {
+    "RY": "RY",
+    "RZ": "RZ",
+    "U3": "U3",
+}
+
+
+def _core():
+    import pyqpanda3.core
+    return pyqpanda3.core
+
+
+#Собираем QCircuit из списка вентилей на заданном физическом кубите
+def compile_circuit(gates, physical=0):
+    core = _core()
+    circuit = core.QCircuit()
+    for name, *params in gates:
+        circuit << getattr(core, GATE_BUILDERS[name])(physical, *params)
+    return circuit
+
+
+#Программа для измерения одного кубита: всегда один кубит и один классический бит
+def compile_qbit_program(qbit):
+    core = _core()
+    return core.QProg(1) << compile_circuit(qbit.gates, 0) << core.measure(0, 0)
+
+
+#Программа для измерения нескольких кубитов в компактном регистре: i-й кубит -> физический i, бит i.
+#Без измерения (with_measure=False) симулятор отдаёт точные вероятности состояний
+def compile_packed_program(qbits, with_measure=True):
+    core = _core()
+    size = len(qbits)
+    program = core.QProg(size)
+    for physical, qbit in enumerate(qbits):
+        program << compile_circuit(qbit.gates, physical)
+    if with_measure:
+        program << core.measure(list(range(size)), list(range(size)))
+    return program
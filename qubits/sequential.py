@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+
+# Последовательная проверка кубитов (SPRT Вальда).
+# Выстрелы берутся небольшими порциями; для каждого кубита копится логарифм отношения
+# правдоподобия двух гипотез о доле единиц:
+#   H0 — честный кубит, доля единиц не больше допустимой p0 = permissible / shots;
+#   H1 — поддельный кубит (неверные углы), доля единиц не меньше forged_rate.
+# Кубит принимается, когда отношение падает ниже log(beta / (1 - alpha)),
+# и отклоняется, когда поднимается выше log((1 - beta) / alpha).
+# alpha — вероятность отклонить честный кубит, beta — принять поддельный.
+# Если за shots выстрелов решение не принято, действует обычное правило ones > permissible.
+
+DEFAULT_STEP = 32
+DEFAULT_FORGED_RATE = 0.05
+
+
+#Подмножество кубитов по позициям; пакеты (TokenBatch) режутся без создания объектов
+def take_qbits(qbits, positions):
+    if hasattr(qbits, "take"):
+        return qbits.take(positions)
+    return [qbits[i] for i in positions]
+
+
+class SequentialTest:
+    def __init__(self, shots, permissible, alpha=1e-3, beta=1e-3, forged_rate=DEFAULT_FORGED_RATE, step=DEFAULT_STEP):
+        self.shots = shots
+        self.permissible = permissible
+        self.step = max(1, int(step))
+        self.p0 = permissible / shots
+        self.p1 = min(max(forged_rate, 2 * self.p0), 1 - 1e-12)
+        self.accept_bound = math.log(beta / (1 - alpha))
+        self.reject_bound = math.log((1 - beta) / alpha)
+        with np.errstate(divide="ignore"):
+            self.one_weight = np.log(self.p1) - np.log(self.p0)
+        self.zero_weight = math.log1p(-self.p1) - math.log1p(-self.p0)
+
+    def log_likelihood_ratio(self, ones, taken):
+        if math.isinf(self.one_weight):
+            return np.where(ones > 0, np.inf, taken * self.zero_weight)
+        return ones * self.one_weight + (taken - ones) * self.zero_weight
+
+    #Возвращает (вердикт, количество выстрелов по каждому кубиту).
+    #При первом отклонённом кубите проверка токена прекращается
+    def run(self, engine, qbits):
+        size = len(qbits)
+        ones = np.zeros(size, dtype=np.int64)
+        used = np.zeros(size, dtype=np.int64)
+        undecided = np.arange(size)
+        taken = 0
+        while undecided.size:
+            portion = min(self.step, self.shots - taken)
+            ones[undecided] += engine.count_ones(take_qbits(qbits, undecided), portion)
+            taken += portion
+            used[undecided] = taken
+            if taken >= self.shots:
+                return not bool((ones[undecided] > self.permissible).any()), used
+            llr = self.log_likelihood_ratio(ones[undecided], taken)
+            if (llr >= self.reject_bound).any():
+                return False, used
+            undecided = undecided[llr > self.accept_bound]
+        return True, used
@@ -0,0 +1,276 @@
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from qubits.batch import TokenBatch, generate_random_key_batch
+from qubits.engines import AnalyticEngine
+from qubits.gates import state_of
+from qubits.qubit_func import DEFAULT_TOKEN_TTL
+from qubits.registry import TokenRegistry
+
+# Сервер проверки токенов: JSON по TCP, одно сообщение — одна строка.
+#
+# Запросы:
+#   {"id": 1, "op": "issue", "qubits": 32, "ttl": 30}
+#       -> {"id": 1, "token_id": 7, "ttl": 30, "qubits": [{"id": 1, "gates": [["U3", θ, φ, λ]]}, ...]}
+#   {"id": 2, "op": "verify", "token_id": 7, "qubits": [...], "shots": 10000, "permissible": 50}
+#       -> {"id": 2, "ok": true, "latency_ms": ..., "queue_ms": ..., "batch_size": ...}
+#   {"id": 3, "op": "stats"}
+#
+# Выданные токены и их ключи хранятся в TokenRegistry сервера (ttl в запросе необязателен).
+# Истёкшие токены снимаются вместе с ключами при выдаче и перед каждым микропакетом.
+# При проверке к присланным кубитам применяется обратный спин по ключам, затем они измеряются движком.
+# Одновременные запросы verify копятся в течение окна window (секунды) или до max_batch штук
+# и проверяются одним вызовом движка в отдельном потоке, не блокируя цикл событий.
+# Реестр и связка ключей меняются только в потоке цикла событий: ключи запросов пакета
+# достаются там же, а в поток движка уходят лишь запросы и готовые KeyBatch.
+# Размер токена ограничен max_qubits, длина строки запроса — max_line байт;
+# на слишком длинную строку сервер отвечает ошибкой и закрывает соединение.
+
+DEFAULT_MAX_QUBITS = 4096
+DEFAULT_MAX_LINE = 1 << 20
+
+
+def qbits_to_message(qbits):
+    return [{"id": qbit.id, "gates": [list(gate) for gate in qbit.gates]} for qbit in qbits]
+
+
+def qbits_from_message(items):
+    state = np.array([state_of(tuple(gate) for gate in item["gates"]) for item in items], dtype=np.complex128)
+    return TokenBatch([item["id"] for item in items], state.reshape(-1, 2))
+
+
+class _Pending:
+    __slots__ = ("request", "future", "received")
+
+    def __init__(self, request, future, received):
+        self.request = request
+        self.future = future
+        self.received = received
+
+
+class TokenServer:
+    def __init__(self, engine=None, keyring=None, window=0.005, max_batch=256, ttl=DEFAULT_TOKEN_TTL,
+                 max_qubits=DEFAULT_MAX_QUBITS, max_line=DEFAULT_MAX_LINE):
+        self.engine = engine or AnalyticEngine()
+        self.registry = TokenRegistry(keyring, default_ttl=ttl)
+        self.keyring = self.registry.keyring
+        self.window = window
+        self.max_batch = max_batch
+        self.max_qubits = max_qubits
+        self.max_line = max_line
+        self.queue = None
+        self.stats = {"requests": 0, "batches": 0, "errors": 0}
+        # один поток: симулятор не рассчитан на параллельные вызовы
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._batcher = None
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        self._server = await asyncio.start_server(self._handle_client, host, port, limit=self.max_line)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # строка длиннее limit: остаток строки не отделить от следующего запроса
+                    self.stats["errors"] += 1
+                    writer.write(json.dumps({"id": None, "error": f"ValueError: строка запроса длиннее "
+                                                                   f"{self.max_line} байт"}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.stats["errors"] += 1
+                    response = {"id": None, "error": f"{type(e).__name__}: {e}"}
+                else:
+                    response = await self.handle(request)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, request):
+        self.stats["requests"] += 1
+        if not isinstance(request, dict):
+            self.stats["errors"] += 1
+            return {"id": None, "error": "TypeError: запрос должен быть JSON-объектом"}
+        op = request.get("op")
+        try:
+            if op == "verify":
+                return await self._verify(request)
+            if op == "issue":
+                return self._issue(request)
+            if op == "stats":
+                return {"id": request.get("id"), **self.stats,
+                        "tokens": len(self.registry), "expired": self.registry.expired}
+            raise ValueError("Неизвестная операция: " + str(op))
+        # любая ошибка запроса (в том числе OverflowError на 1e400) — ответ с ошибкой, а не обрыв соединения
+        except Exception as e:
+            self.stats["errors"] += 1
+            return {"id": request.get("id"), "error": f"{type(e).__name__}: {e}"}
+
+    #Выдача токена: ключи остаются на сервере, клиенту уходят публичные кубиты после спина
+    def _issue(self, request):
+        ttl = request.get("ttl")
+        qubits = int(request["qubits"])
+        if not 0 < qubits <= self.max_qubits:
+            raise ValueError(f"qubits должно быть от 1 до {self.max_qubits}: {qubits}")
+        keys = generate_random_key_batch(qubits)
+        public = keys.make_public()
+        public.make_spin_from_keys(keys)
+        token = self.registry.issue(public, keys, ttl=None if ttl is None else float(ttl))
+        return {"id": request.get("id"), "token_id": token.id, "ttl": token.ttl, "qubits": qbits_to_message(public)}
+
+    async def _verify(self, request):
+        received = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_Pending(request, future, received))
+        ok, started, batch_size = await future
+        done = time.perf_counter()
+        return {
+            "id": request.get("id"),
+            "ok": ok,
+            "latency_ms": (done - received) * 1000,
+            "queue_ms": (started - received) * 1000,
+            "batch_size": batch_size,
+        }
+
+    #Сбор микропакетов: первый запрос открывает окно, остальные добавляются, пока оно не закрылось
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.stats["batches"] += 1
+            self.registry.expire()
+            keys = [self._keys_for(pending.request) for pending in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self._verify_batch, batch, keys)
+            except Exception as e:
+                results = [e] * len(batch)
+            for pending, result in zip(batch, results):
+                if pending.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result((result, started, len(batch)))
+
+    #Ключи токена из запроса (в потоке цикла событий) или ошибка, если токена нет
+    def _keys_for(self, request):
+        try:
+            token_id = request["token_id"]
+            if self.registry.get(token_id) is None:
+                raise KeyError("Токен с id " + str(token_id) + " не найден или истёк")
+            return self.keyring.batch_for(token_id)
+        except Exception as e:
+            return e
+
+    #Проверка пакета запросов по уже найденным ключам. Кубиты всех запросов с одинаковым
+    #числом выстрелов склеиваются и измеряются одним вызовом движка. Ошибка в одном запросе
+    #становится его результатом и не задевает остальные запросы пакета
+    def _verify_batch(self, batch, keys):
+        results = [None] * len(batch)
+        groups = {}
+        for index, (pending, token_keys) in enumerate(zip(batch, keys)):
+            request = pending.request
+            try:
+                if isinstance(token_keys, Exception):
+                    raise token_keys
+                shots = int(request["shots"])
+                permissible = int(request["permissible"])
+                if shots <= 0 or permissible < 0:
+                    raise ValueError("shots должно быть положительным, permissible — неотрицательным")
+                qbits = qbits_from_message(request["qubits"])
+                check_token_qbits(qbits.ids, token_keys.ids)
+                qbits.make_reverse_spin_from_keys(token_keys)
+            except Exception as e:
+                results[index] = e
+                continue
+            groups.setdefault(shots, []).append((index, qbits, permissible))
+        for shots, members in groups.items():
+            joined = TokenBatch(
+                np.concatenate([qbits.ids for _, qbits, _ in members]),
+                np.concatenate([qbits.state for _, qbits, _ in members]),
+                np.concatenate([qbits.depth for _, qbits, _ in members]),
+            )
+            ones = self.engine.count_ones(joined, shots)
+            start = 0
+            for index, qbits, permissible in members:
+                part = ones[start:start + len(qbits)]
+                start += len(qbits)
+                results[index] = not bool((part > permissible).any())
+        return results
+
+
+#Присланные кубиты должны быть ровно кубитами токена: те же id, без пропусков и повторов.
+#Иначе пустой или неполный набор прошёл бы проверку
+def check_token_qbits(ids, token_ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    unique = np.unique(ids)
+    if len(unique) != len(ids):
+        raise ValueError("Повторяющиеся id кубитов в запросе")
+    if len(ids) != len(token_ids) or not np.array_equal(unique, np.unique(token_ids)):
+        raise ValueError(f"Набор кубитов не совпадает с токеном: прислано {len(ids)}, в токене {len(token_ids)}")
+
+
+#Клиент для одного соединения: запросы идут последовательно, ответы читаются по строкам
+class TokenClient:
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self._ids = itertools.count(1)
+
+    async def connect(self, host="127.0.0.1", port=8765):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        return self
+
+    async def request(self, op, **fields):
+        message = {"id": next(self._ids), "op": op, **fields}
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def issue(self, qubits, ttl=None):
+        if ttl is None:
+            return await self.request("issue", qubits=qubits)
+        return await self.request("issue", qubits=qubits, ttl=ttl)
+
+    async def verify(self, token_id, qubits, shots, permissible):
+        return await self.request("verify", token_id=token_id, qubits=qubits, shots=shots, permissible=permissible)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
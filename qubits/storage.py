@@ -0,0 +1,365 @@
+import bisect
+import math
+import shutil
+import struct
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from qubits.batch import KeyBatch, TokenBatch
+from qubits.gates import state_of
+from qubits.keyring import PrivateKeyring
+from qubits.qubit_func import DEFAULT_TOKEN_TTL, PrivateQbit, PublicQbit, Token
+
+# Двоичный формат хранения приватных ключей и токенов.
+#
+#   заголовок (HEADER_SIZE байт) | записи RECORD_DTYPE | вентили GATE_DTYPE
+#
+# Записи фиксированной ширины: по одной на кубит (id токена, id кубита, θ, φ в градусах,
+# время создания в секундах Unix, ссылка на его вентили в секции вентилей, срок жизни
+# токена в секундах и depth — сколько физических вентилей применено к кубиту; вентили
+# хранятся свёрнутыми, и без depth шумный движок проверял бы загруженный токен иначе).
+# У приватных ключей вентилей и срока жизни нет (NaN), у публичных кубитов θ и φ
+# неизвестны (NaN). В файлах версии 1 срока жизни нет, их токены получают
+# DEFAULT_TOKEN_TTL. В файлах версий 1 и 2 записи короче (RECORD_DTYPE_V2) и depth нет:
+# кубиты получают его как свежесобранные из сохранённых вентилей.
+# Обе секции выровнены по 8 байт и открываются через numpy.memmap без копирования,
+# поэтому файл на миллионы ключей открывается сразу, а читаются только нужные страницы.
+# Если записи шли по возрастанию (id токена, id кубита), в заголовке ставится FLAG_SORTED
+# и ключи токена находятся двоичным поиском.
+
+MAGIC = b"QTKN"
+VERSION = 3
+SUPPORTED_VERSIONS = (1, 2, 3)
+
+KIND_KEYS = 1
+KIND_TOKENS = 2
+
+FLAG_SORTED = 1
+
+# magic, version, kind, flags, record_count, records_offset, gate_count, gates_offset
+HEADER = struct.Struct("<4sHHIQQQQ")
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ("token_id", "<i8"),
+    ("id", "<i8"),
+    ("theta", "<f8"),
+    ("phi", "<f8"),
+    ("created", "<f8"),
+    ("gate_start", "<u8"),
+    ("gate_count", "<u4"),
+    ("ttl", "<f4"),
+    ("depth", "<u4"),
+    ("reserved", "<u4"),
+])
+
+# записи версий 1 и 2 (в версии 1 на месте ttl — нули)
+RECORD_DTYPE_V2 = np.dtype([
+    ("token_id", "<i8"),
+    ("id", "<i8"),
+    ("theta", "<f8"),
+    ("phi", "<f8"),
+    ("created", "<f8"),
+    ("gate_start", "<u8"),
+    ("gate_count", "<u4"),
+    ("ttl", "<f4"),
+])
+
+GATE_DTYPE = np.dtype([
+    ("op", "<u4"),
+    ("reserved", "<u4"),
+    ("params", "<f8", (3,)),
+])
+
+GATE_CODES = {"RY": 1, "RZ": 2, "U3": 3}
+GATE_NAMES = {code: name for name, code in GATE_CODES.items()}
+GATE_ARITY = {"RY": 1, "RZ": 1, "U3": 3}
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _timestamp(created):
+    if created is None:
+        return time.time()
+    if isinstance(created, datetime):
+        return created.timestamp()
+    return float(created)
+
+
+#Вентили кубитов-объектов -> массив GATE_DTYPE и количество вентилей на кубит
+def _encode_gates(gate_lists):
+    counts = np.fromiter((len(gates) for gates in gate_lists), dtype=np.uint32, count=len(gate_lists))
+    encoded = np.zeros(int(counts.sum()), dtype=GATE_DTYPE)
+    position = 0
+    for gates in gate_lists:
+        for name, *params in gates:
+            encoded[position]["op"] = GATE_CODES[name]
+            encoded[position]["params"][:len(params)] = params
+            position += 1
+    return encoded, counts
+
+
+#Состояния TokenBatch -> по одному U3 на кубит (как gates_for_state, но векторно)
+def _encode_states(state):
+    a = state[:, 0]
+    b = state[:, 1]
+    nonzero = np.abs(b) >= 1e-12
+    encoded = np.zeros(int(nonzero.sum()), dtype=GATE_DTYPE)
+    encoded["op"] = GATE_CODES["U3"]
+    a = a[nonzero]
+    b = b[nonzero]
+    encoded["params"][:, 0] = 2 * np.arctan2(np.abs(b), np.abs(a))
+    encoded["params"][:, 1] = np.where(np.abs(a) >= 1e-12, np.angle(b) - np.angle(a), 0.0)
+    return encoded, nonzero.astype(np.uint32)
+
+
+def _decode_gates(gates):
+    result = []
+    for gate in gates:
+        name = GATE_NAMES[int(gate["op"])]
+        result.append((name, *(float(p) for p in gate["params"][:GATE_ARITY[name]])))
+    return result
+
+
+#Потоковая запись файла: записи пишутся сразу за заголовком, вентили копятся
+#во временном файле и дописываются в конец при close()
+class StorageWriter:
+    def __init__(self, path, kind=KIND_KEYS):
+        self.path = path
+        self.kind = kind
+        self.record_count = 0
+        self.gate_count = 0
+        self.sorted = True
+        self._last = None
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * HEADER_SIZE)
+        self._gates = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    #Пакет записей одним куском; token_id — число или массив (по записи на кубит),
+    #gates — массив GATE_DTYPE, gate_counts — вентилей на запись, ttl — срок жизни токена,
+    #depth — физических вентилей на запись
+    def write_records(self, token_id, ids, theta=np.nan, phi=np.nan, created=None, gates=None, gate_counts=None,
+                      ttl=np.nan, depth=0):
+        ids = np.asarray(ids, dtype=np.int64)
+        records = np.zeros(len(ids), dtype=RECORD_DTYPE)
+        records["token_id"] = token_id
+        records["id"] = ids
+        records["theta"] = theta
+        records["phi"] = phi
+        records["created"] = _timestamp(created)
+        records["ttl"] = ttl
+        records["depth"] = depth
+        if gates is not None and len(gates):
+            records["gate_count"] = gate_counts
+            starts = np.cumsum(gate_counts, dtype=np.uint64) - gate_counts
+            records["gate_start"] = self.gate_count + starts
+            self._gates.write(np.ascontiguousarray(gates, dtype=GATE_DTYPE).tobytes())
+            self.gate_count += len(gates)
+
+        self._track_order(token_id, ids)
+        self._file.write(records.tobytes())
+        self.record_count += len(records)
+
+    #Приватные ключи токена: список PrivateQbit или KeyBatch
+    def add_keys(self, token_id, private_qbits, created=None):
+        if not isinstance(private_qbits, KeyBatch):
+            private_qbits = KeyBatch.from_qbits(private_qbits)
+        self.write_records(token_id, private_qbits.ids, private_qbits.theta, private_qbits.phi, created)
+
+    #Все ключи связки, токены по возрастанию id
+    def add_keyring(self, keyring, created=None):
+        for token_id in sorted(keyring.token_ids()):
+            self.add_keys(token_id, keyring.batch_for(token_id), created)
+
+    #Публичные кубиты токена (объекты или TokenBatch) вместе с их вентилями
+    def add_token(self, token):
+        qbits = token.array_of_public_qbits
+        if isinstance(qbits, TokenBatch):
+            gates, gate_counts = _encode_states(qbits.state)
+            ids = qbits.ids
+            depth = qbits.depth
+        else:
+            gates, gate_counts = _encode_gates([q.gates for q in qbits])
+            ids = [q.id for q in qbits]
+            depth = [q.depth for q in qbits]
+        self.write_records(token.id, ids, created=token.time_of_creation, gates=gates, gate_counts=gate_counts,
+                           ttl=token.ttl, depth=depth)
+
+    def _track_order(self, token_id, ids):
+        if not self.sorted or not len(ids):
+            return
+        token_ids = np.broadcast_to(np.asarray(token_id, dtype=np.int64), ids.shape)
+        token_step = np.diff(token_ids)
+        ascending = np.all((token_step > 0) | ((token_step == 0) & (np.diff(ids) > 0)))
+        first = (int(token_ids[0]), int(ids[0]))
+        if not ascending or (self._last is not None and first <= self._last):
+            self.sorted = False
+        self._last = (int(token_ids[-1]), int(ids[-1]))
+
+    def close(self):
+        if self._file.closed:
+            return
+        records_offset = HEADER_SIZE
+        gates_offset = _align(records_offset + self.record_count * RECORD_DTYPE.itemsize)
+        self._file.write(b"\0" * (gates_offset - self._file.tell()))
+        self._gates.seek(0)
+        shutil.copyfileobj(self._gates, self._file)
+        self._gates.close()
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(
+            MAGIC, VERSION, self.kind, FLAG_SORTED if self.sorted else 0,
+            self.record_count, records_offset, self.gate_count, gates_offset,
+        ))
+        self._file.close()
+
+
+def save_keys(path, keys, token_id=0, created=None):
+    with StorageWriter(path, KIND_KEYS) as writer:
+        if isinstance(keys, PrivateKeyring):
+            writer.add_keyring(keys, created)
+        else:
+            writer.add_keys(token_id, keys, created)
+
+
+def save_tokens(path, tokens):
+    with StorageWriter(path, KIND_TOKENS) as writer:
+        for token in tokens:
+            writer.add_token(token)
+
+
+#Открытый файл: records и gates — memmap только для чтения
+class TokenStore:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER.size:
+            raise ValueError(f"Файл {path} слишком короткий для заголовка")
+        magic, version, kind, flags, record_count, records_offset, gate_count, gates_offset = HEADER.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"Файл {path} не является хранилищем токенов")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Неподдерживаемая версия формата: {version}")
+
+        self.version = version
+        self.kind = kind
+        self.sorted = bool(flags & FLAG_SORTED)
+        self.records = self._map(RECORD_DTYPE if version >= 3 else RECORD_DTYPE_V2, records_offset, record_count)
+        self.gates = self._map(GATE_DTYPE, gates_offset, gate_count)
+
+    def _map(self, dtype, offset, count):
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    #Хранилище лишь отпускает свои memmap: записи из records_for()/find() и срезы от них
+    #держат отображение сами, и файл отображается, пока жив последний из них
+    def close(self):
+        self.records = np.zeros(0, dtype=self.records.dtype)
+        self.gates = np.zeros(0, dtype=GATE_DTYPE)
+
+    def token_ids(self):
+        return np.unique(self.records["token_id"]).tolist()
+
+    #Записи токена: при FLAG_SORTED — срез по двоичному поиску, иначе проход по столбцу.
+    #bisect обращается к отдельным элементам, а np.searchsorted скопировал бы
+    #несмежный столбец целиком и прочитал весь файл
+    def records_for(self, token_id):
+        if self.sorted:
+            column = self.records["token_id"]
+            start = bisect.bisect_left(column, token_id)
+            stop = bisect.bisect_right(column, token_id, lo=start)
+            records = self.records[start:stop]
+        else:
+            records = self.records[np.flatnonzero(self.records["token_id"] == token_id)]
+        if not len(records):
+            raise KeyError(f"Токен с id {token_id} не найден")
+        return records
+
+    def find(self, token_id, qbit_id):
+        records = self.records_for(token_id)
+        match = np.flatnonzero(records["id"] == qbit_id)
+        return records[match[0]] if len(match) else None
+
+    def gates_of(self, record):
+        start = int(record["gate_start"])
+        return _decode_gates(self.gates[start:start + int(record["gate_count"])])
+
+    def key_batch(self, token_id):
+        records = self.records_for(token_id)
+        return KeyBatch(records["id"], records["theta"], records["phi"])
+
+    def private_qbits(self, token_id):
+        records = self.records_for(token_id)
+        return [PrivateQbit(int(r["id"]), float(r["theta"]), float(r["phi"])) for r in records]
+
+    #Загрузка ключей в PrivateKeyring пакетами KeyBatch (по умолчанию — всех токенов)
+    def fill_keyring(self, keyring=None, token_ids=None):
+        keyring = PrivateKeyring() if keyring is None else keyring
+        for token_id in self.token_ids() if token_ids is None else token_ids:
+            keyring.add_many(token_id, self.key_batch(token_id))
+        return keyring
+
+    #Состояния кубитов токена. Обычный случай — не больше одного U3 на кубит
+    #(так пишет add_token) — считается векторно, остальное через state_of
+    def token_batch(self, token_id):
+        records = self.records_for(token_id)
+        counts = records["gate_count"]
+        state = np.zeros((len(records), 2), dtype=np.complex128)
+        state[:, 0] = 1
+        has_gate = counts > 0
+        gates = self.gates[records["gate_start"][has_gate].astype(np.int64)]
+        if np.all(counts <= 1) and np.all(gates["op"] == GATE_CODES["U3"]):
+            theta = gates["params"][:, 0]
+            phi = gates["params"][:, 1]
+            state[has_gate, 0] = np.cos(theta / 2)
+            state[has_gate, 1] = np.exp(1j * phi) * np.sin(theta / 2)
+        else:
+            for index in np.flatnonzero(has_gate):
+                state[index] = state_of(self.gates_of(records[index]))
+        return TokenBatch(records["id"], state, records["depth"] if self.version >= 3 else None)
+
+    def token(self, token_id, batch=False):
+        records = self.records_for(token_id)
+        if batch:
+            qbits = self.token_batch(token_id)
+        else:
+            qbits = []
+            for record in records:
+                qbit = PublicQbit(int(record["id"]))
+                qbit.append_gates(self.gates_of(record))
+                if self.version >= 3:
+                    qbit.depth = int(record["depth"])
+                qbits.append(qbit)
+        created = float(records[0]["created"])
+        ttl = float(records[0]["ttl"]) if self.version >= 2 else math.nan
+        token = Token(token_id, qbits, ttl=DEFAULT_TOKEN_TTL if math.isnan(ttl) else ttl)
+        token.time_of_creation = datetime.fromtimestamp(created)
+        # возраст токена переносится на монотонные часы этого процесса
+        token.monotonic_time_of_creation = time.monotonic() - (time.time() - created)
+        return token
+
+
+def open_store(path):
+    return TokenStore(path)
@@ -0,0 +1,144 @@
+import os
+import threading
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, as_completed
+
+from qubits.batch import TokenBatch
+from qubits.engines import make_engine
+from qubits.qubit_func import is_token_expired
+
+# Параллельная проверка многих токенов на пуле процессов.
+# В каждом процессе-воркере создаётся свой движок (для "qvm" — свой CPUQVM),
+# токен передаётся воркеру в виде TokenBatch: массивы id и амплитуд легко сериализуются,
+# в отличие от объектов QCircuit. Крупный токен можно резать на куски по chunk_size кубитов.
+
+_worker_engine = None
+
+
+def _init_worker(engine_name, engine_options):
+    global _worker_engine
+    _worker_engine = make_engine(engine_name, **engine_options)
+
+
+def _verify_chunk(batch, shots, permissible):
+    ones = _worker_engine.count_ones(batch, shots)
+    return not bool((ones > permissible).any())
+
+
+def _as_batch(qbits):
+    if isinstance(qbits, TokenBatch):
+        return qbits
+    return TokenBatch.from_qbits(qbits)
+
+
+def _finished(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TokenVerifier:
+    def __init__(self, workers=None, engine="qvm", engine_options=None, chunk_size=None, mp_context=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        #Куски снимаются с _pending из обработчиков в потоках пула, поэтому множество под блокировкой
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(engine, dict(engine_options or {})),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
+
+    #Проверка одного токена; результат — Future с тем же bool, что вернул бы measure_token
+    def submit(self, token, shots, permissible):
+        if is_token_expired(token):
+            return _finished(False)
+        batch = _as_batch(token.array_of_public_qbits)
+        size = len(batch)
+        if not size:
+            return _finished(True)
+        step = self.chunk_size or size
+        chunks = [
+            self._executor.submit(_verify_chunk, batch.take(slice(start, start + step)), shots, permissible)
+            for start in range(0, size, step)
+        ]
+        return self._combine(chunks)
+
+    #Проверка набора токенов. ordered=True — результаты в порядке токенов,
+    #иначе по мере готовности. Выдаёт пары (токен, результат)
+    def verify_many(self, tokens, shots, permissible, ordered=True):
+        tokens = list(tokens)
+        futures = [self.submit(token, shots, permissible) for token in tokens]
+        if ordered:
+            for token, future in zip(tokens, futures):
+                yield token, future.result()
+            return
+        positions = {future: index for index, future in enumerate(futures)}
+        for future in as_completed(futures):
+            yield tokens[positions[future]], future.result()
+
+    #Отмена всех ещё не начатых проверок. Вне блокировки: обработчики отменённых кусков сразу снимают их с _pending
+    def cancel(self):
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+
+    def close(self, cancel=False):
+        if cancel:
+            self.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    #Токен не прошёл, как только не прошёл любой его кусок — остальные куски отменяются.
+    #Отмена Future токена отменяет и его куски
+    def _combine(self, chunks):
+        token_future = Future()
+        remaining = [len(chunks)]
+        lock = threading.RLock()
+        with self._pending_lock:
+            self._pending.update(chunks)
+
+        def settle(method, *args):
+            try:
+                method(*args)
+            except InvalidStateError:
+                pass
+
+        #Блокировка реентерабельная: cancel() сразу вызывает обработчики других кусков
+        #(и самого токена) в том же потоке, и они снова заходят сюда
+        def on_chunk_done(chunk):
+            with self._pending_lock:
+                self._pending.discard(chunk)
+            with lock:
+                if token_future.done():
+                    return
+                if chunk.cancelled():
+                    settle(token_future.cancel)
+                elif chunk.exception() is not None:
+                    settle(token_future.set_exception, chunk.exception())
+                elif not chunk.result():
+                    settle(token_future.set_result, False)
+                else:
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+                    settle(token_future.set_result, True)
+            for other in chunks:
+                other.cancel()
+
+        def on_token_done(future):
+            if future.cancelled():
+                for chunk in chunks:
+                    chunk.cancel()
+
+        token_future.add_done_callback(on_token_done)
+        for chunk in chunks:
+            chunk.add_done_callback(on_chunk_done)
+        return token_future
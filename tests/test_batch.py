@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+from qubits.batch import KeyBatch, TokenBatch
+from qubits.qubit_func import PublicQbit
+
+
+def make_qbit(id, angle=0.0):
+    qbit = PublicQbit(id)
+    if angle:
+        qbit.append_gates([("RY", angle)])
+    return qbit
+
+
+def test_append_matches_from_qbits():
+    qbits = [make_qbit(i, i * 0.1) for i in range(1, 40)]
+    batch = TokenBatch([])
+    for qbit in qbits:
+        batch.append(qbit)
+    expected = TokenBatch.from_qbits(qbits)
+    assert batch.ids.tolist() == expected.ids.tolist()
+    assert np.allclose(batch.state, expected.state)
+    assert batch.depth.tolist() == expected.depth.tolist()
+
+
+#Спин после добавления меняет только видимую часть буфера, следующее добавление её не портит
+def test_append_after_spin():
+    batch = TokenBatch([1, 2])
+    batch.append(make_qbit(3))
+    batch.make_spin(np.array([180.0, 0.0, 180.0]), np.zeros(3))
+    batch.append(make_qbit(4, math.pi))
+    assert np.allclose(batch.probabilities_of_one(), [1, 0, 1, 1])
+    assert batch.depth.tolist() == [2, 2, 2, 1]
+
+
+def test_slices_are_batches():
+    keys = KeyBatch([1, 2, 3, 4], [10.0, 20.0, 30.0, 40.0], [0.0] * 4)
+    part = keys[1:3]
+    assert isinstance(part, KeyBatch)
+    assert part.ids.tolist() == [2, 3]
+    assert keys[::-1].theta.tolist() == [40.0, 30.0, 20.0, 10.0]
+    assert keys[-1].id == 4
+    with pytest.raises(IndexError):
+        keys[4]
+
+    token = TokenBatch([5, 6, 7])
+    assert isinstance(token[:2], TokenBatch)
+    assert token[:2].ids.tolist() == [5, 6]
+    assert [q.id for q in token[1:]] == [6, 7]
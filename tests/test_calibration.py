@@ -0,0 +1,34 @@
+import pytest
+
+from qubits.calibration import Calibrator, binomial_cdf, binomial_sf
+from qubits.noise import NoiseModel
+
+
+#Перебор всех s подряд — эталон минимального числа выстрелов
+def brute_force_shots(calibrator, qubits, limit):
+    for shots in range(1, limit + 1):
+        if calibrator._feasible(qubits, shots):
+            return shots
+    return None
+
+
+# при таком шуме выполнимость по s не монотонна: деление пополам давало 146 вместо 135 при N = 8
+@pytest.mark.parametrize("qubits", [8, 16, 32])
+def test_calibrate_finds_true_minimum(qubits):
+    calibrator = Calibrator(noise=NoiseModel(depolarizing=0.001, readout_error_0=0.01), max_shots=1000)
+    calibration = calibrator.calibrate(qubits)
+    assert calibration.shots == brute_force_shots(calibrator, qubits, calibration.shots)
+    assert calibration.far <= calibrator.target_far
+    assert calibration.frr <= calibrator.target_frr
+
+
+def test_calibrate_without_noise_matches_brute_force():
+    calibrator = Calibrator(target_far=1e-3, target_frr=1e-3, forged_rate=0.3, max_shots=1000)
+    for qubits in (1, 2, 4):
+        assert calibrator.calibrate(qubits).shots == brute_force_shots(calibrator, qubits, 1000)
+
+
+def test_binomial_tails_sum_to_one():
+    cdf = binomial_cdf(20, [0.1, 0.5])
+    sf = binomial_sf(20, [0.1, 0.5])
+    assert abs(cdf + sf - 1).max() < 1e-12
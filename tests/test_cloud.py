@@ -0,0 +1,140 @@
+import math
+
+import numpy as np
+import pytest
+
+from qubits.cloud import CloudEngine, CloudJobError, LocalCloudService
+from qubits.qubit_func import PublicQbit
+
+
+#Кубит в |0⟩ (пустая схема) или в |1⟩ (RY(π))
+def make_qbit(id, one=False):
+    qbit = PublicQbit(id)
+    if one:
+        qbit.append_gates([("RY", math.pi)])
+    return qbit
+
+
+class FakeResult:
+    def __init__(self, counts):
+        self.counts = counts
+
+    def get_counts_list(self):
+        return self.counts
+
+
+#Задание, которое отдаёт статусы по очереди (последний повторяется) и готовые результаты
+class FakeJob:
+    def __init__(self, counts, statuses=("FINISHED",)):
+        self.counts = counts
+        self.statuses = list(statuses)
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def status(self):
+        return self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+    def result(self):
+        return FakeResult(self.counts)
+
+
+#Бэкенд без симулятора: все width кубитов программы в |0⟩, первые failures запусков падают.
+#statuses — статусы каждого задания
+class FakeBackend:
+    def __init__(self, width=1, failures=0, statuses=("FINISHED",)):
+        self.width = width
+        self.failures = failures
+        self.statuses = statuses
+        self.runs = []
+        self.jobs = []
+
+    def run(self, programs, shots):
+        self.runs.append(len(programs))
+        if len(self.runs) <= self.failures:
+            raise ConnectionError("облако недоступно")
+        self.jobs.append(FakeJob([{"0" * self.width: shots} for _ in programs], self.statuses))
+        return self.jobs[-1]
+
+
+class FakeService:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def backend(self, name):
+        return self._backend
+
+
+def make_engine(backend, **options):
+    options = {"backoff": 0.0, "poll_interval": 0.0, **options}
+    return CloudEngine(service=FakeService(backend), **options)
+
+
+def test_marginal_counts_on_local_service():
+    qbits = [make_qbit(i, one=i % 2 == 0) for i in range(1, 8)]
+    engine = CloudEngine(service=LocalCloudService(), program_width=3, programs_per_job=2)
+    ones = engine.count_ones(qbits, 100)
+    assert ones.tolist() == [0 if i % 2 else 100 for i in range(1, 8)]
+
+
+def test_counts_uses_counts_dict_format():
+    engine = CloudEngine(service=LocalCloudService())
+    assert engine.counts(make_qbit(1, one=True), 50) == {"1": 50}
+    assert engine.counts(make_qbit(2), 50) == {"0": 50}
+
+
+def test_programs_grouped_into_jobs():
+    backend = FakeBackend(width=2)
+    engine = make_engine(backend, program_width=2, programs_per_job=2)
+    ones = engine.count_ones([make_qbit(i) for i in range(1, 11)], 10)
+    assert sorted(backend.runs) == [1, 2, 2]
+    assert ones.tolist() == [0] * 10
+
+
+def test_retries_after_failures():
+    backend = FakeBackend(failures=2)
+    engine = make_engine(backend, retries=3, programs_per_job=1)
+    assert engine.count_ones([make_qbit(1)], 10).tolist() == [0]
+    assert len(backend.runs) == 3
+
+
+def test_gives_up_after_retries():
+    backend = FakeBackend(failures=10)
+    engine = make_engine(backend, retries=2)
+    with pytest.raises(ConnectionError):
+        engine.count_ones([make_qbit(1)], 10)
+    assert len(backend.runs) == 3
+
+
+def test_failed_job_status_is_retried_then_raised():
+    backend = FakeBackend(statuses=("RUNNING", "FAILED"))
+    engine = make_engine(backend, retries=1)
+    with pytest.raises(CloudJobError):
+        engine.count_ones([make_qbit(1)], 10)
+    assert len(backend.runs) == 2
+    assert all(job.cancelled for job in backend.jobs)
+
+
+def test_stuck_job_times_out_through_retry_path():
+    backend = FakeBackend(statuses=("QUEUING",))
+    engine = make_engine(backend, retries=1, job_timeout=0.05, poll_interval=0.01)
+    with pytest.raises(CloudJobError, match="не завершилось"):
+        engine.count_ones([make_qbit(1)], 10)
+    assert len(backend.runs) == 2
+    assert all(job.cancelled for job in backend.jobs)
+
+
+#Ошибка разбора результата — не сбой облака: без повторов и без отмены готового задания
+def test_programming_errors_are_not_retried():
+    backend = FakeBackend()
+    backend.run = lambda programs, shots: backend.runs.append(len(programs)) or FakeJob(None)
+    engine = make_engine(backend, retries=3)
+    with pytest.raises(TypeError):
+        engine.count_ones([make_qbit(1)], 10)
+    assert len(backend.runs) == 1
+
+
+def test_empty_input():
+    engine = make_engine(FakeBackend())
+    assert np.array_equal(engine.count_ones([], 10), np.zeros(0, dtype=np.int64))
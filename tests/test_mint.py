@@ -0,0 +1,21 @@
+import numpy as np
+
+from qubits.mint import mint_to_keyring
+
+
+def test_seeded_mint_is_reproducible():
+    first = mint_to_keyring(5, 4, rng=1, chunk_qubits=8)
+    second = mint_to_keyring(5, 4, rng=1, chunk_qubits=8)
+    assert sorted(first.token_ids()) == [1, 2, 3, 4, 5]
+    for token_id in first.token_ids():
+        assert np.array_equal(first.batch_for(token_id).theta, second.batch_for(token_id).theta)
+
+
+#Ключи токена не держат блок выпуска: углы — собственные массивы длины токена
+def test_keys_do_not_pin_the_chunk():
+    keyring = mint_to_keyring(8, 4, rng=1, chunk_qubits=32)
+    for token_id in keyring.token_ids():
+        keys = keyring.batch_for(token_id)
+        for angles in (keys.theta, keys.phi):
+            assert angles.base is None
+            assert angles.shape == (4,)
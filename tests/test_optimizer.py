@@ -0,0 +1,74 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from qubits.engines import AnalyticEngine, QVMEngine
+from qubits.gates import probability_of_one, state_of
+from qubits.optimizer import optimize_gates, unitary_of
+from qubits.qubit_func import PublicQbit
+
+core = pytest.importorskip("pyqpanda3.core")
+
+
+#Кубит с произвольной (не свёрнутой) схемой — как до оптимизации
+class RawQbit:
+    def __init__(self, id, gates):
+        self.id = id
+        self.gates = gates
+
+
+def random_gates(rng, length):
+    gates = []
+    for _ in range(length):
+        name = rng.choice(["RY", "RZ", "U3"])
+        arity = 3 if name == "U3" else 1
+        gates.append((name, *(rng.uniform(-math.pi, math.pi) for _ in range(arity))))
+    return gates
+
+
+#Матрицы совпадают с точностью до глобальной фазы
+def same_up_to_phase(left, right):
+    left = np.array(left)
+    right = np.array(right)
+    index = np.unravel_index(np.argmax(abs(right)), right.shape)
+    return np.allclose(left * (right[index] / left[index]), right, atol=1e-9)
+
+
+def test_optimized_gates_keep_unitary():
+    rng = random.Random(1)
+    for length in range(1, 12):
+        gates = random_gates(rng, length)
+        optimized = optimize_gates(gates)
+        assert len(optimized) <= 1
+        assert same_up_to_phase(unitary_of(optimized), unitary_of(gates))
+
+
+def test_spin_and_reverse_fold_to_empty_circuit():
+    qbit = PublicQbit(3)
+    qbit.make_spin(37.0, 123.0)
+    qbit.make_reverse_spin(37.0, 123.0)
+    assert qbit.gates == []
+    assert qbit.depth == 4
+
+
+#Вероятности CPUQVM на исходных и свёрнутых схемах, на любых id кубитов (переназначение
+#на компактный регистр) и при упаковке по нескольку кубитов в программу
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_qvm_matches_optimized_and_analytic(batch_size):
+    rng = random.Random(2)
+    raw = [RawQbit(id, random_gates(rng, 5)) for id in (1, 40, 7, 1000, 2)]
+    fused = [RawQbit(qbit.id, optimize_gates(qbit.gates)) for qbit in raw]
+    engine = QVMEngine(core.CPUQVM(), batch_size=batch_size)
+    expected = [probability_of_one(qbit.gates) for qbit in raw]
+    assert np.allclose(engine.probabilities_of_one(raw), expected, atol=1e-9)
+    assert np.allclose(engine.probabilities_of_one(fused), expected, atol=1e-9)
+    assert np.allclose(AnalyticEngine().probabilities_of_one(fused), expected, atol=1e-9)
+
+
+def test_qvm_counts_follow_state():
+    engine = QVMEngine(core.CPUQVM(), batch_size=2)
+    qbits = [RawQbit(5, [("RY", math.pi)]), RawQbit(9, []), RawQbit(11, [("U3", math.pi, 0.3, 0.2)])]
+    assert engine.count_ones(qbits, 50).tolist() == [50, 0, 50]
+    assert abs(state_of(qbits[2].gates)[1]) == pytest.approx(1.0)
@@ -0,0 +1,72 @@
+from qubits.batch import generate_random_key_batch
+from qubits.registry import TokenRegistry
+
+
+#Ручные часы вместо time.monotonic
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_registry():
+    clock = FakeClock()
+    return TokenRegistry(default_ttl=10, clock=clock), clock
+
+
+def issue(registry, ttl=None):
+    keys = generate_random_key_batch(4, rng=1)
+    return registry.issue(keys.make_public(), keys, ttl=ttl)
+
+
+def test_expiry_removes_tokens_and_keys():
+    registry, clock = make_registry()
+    short = issue(registry, ttl=1)
+    long = issue(registry)
+    clock.now = 2
+    assert registry.get(short.id) is None
+    assert short.id in registry._tokens  # ещё не снят, но уже не виден
+    assert registry.expire() == [short.id]
+    assert len(registry) == 1 and registry.expired == 1
+    assert not registry.keyring.has_token(short.id)
+    assert registry.keyring.has_token(long.id)
+    assert len(registry.keyring) == 4
+
+
+def test_issue_expires_old_tokens():
+    registry, clock = make_registry()
+    for _ in range(5):
+        issue(registry, ttl=1)
+    clock.now = 5
+    token = issue(registry)
+    assert len(registry) == 1
+    assert registry.get(token.id) is token
+    assert len(registry.keyring) == 4
+
+
+def test_revoke_and_heap_compaction():
+    registry, clock = make_registry()
+    tokens = [issue(registry) for _ in range(200)]
+    for token in tokens[:190]:
+        assert registry.revoke(token.id)
+    assert not registry.revoke(tokens[0].id)
+    assert len(registry) == 10
+    assert len(registry._heap) <= 2 * len(registry) + 64
+    assert len(registry.keyring) == 40
+    clock.now = 20
+    assert sorted(registry.expire()) == [token.id for token in tokens[190:]]
+    assert len(registry.keyring) == 0
+
+
+#Устаревшая запись кучи от отозванного токена не снимает токен, зарегистрированный заново с тем же id
+def test_reregistered_id_survives_stale_heap_entry():
+    registry, clock = make_registry()
+    token = issue(registry, ttl=1)
+    registry.revoke(token.id)
+    token.ttl = 100
+    registry.register(token)
+    clock.now = 5
+    assert registry.expire() == []
+    assert registry.get(token.id) is token
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from qubits.server import TokenClient, TokenServer
+
+
+#Сервер на свободном порту и клиент к нему; test получает (server, client)
+def run_with_server(test, **options):
+    async def main():
+        server = TokenServer(**options)
+        listener = await server.start(port=0)
+        client = await TokenClient().connect(port=listener.sockets[0].getsockname()[1])
+        try:
+            return await test(server, client)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+async def raw(client, line):
+    client.writer.write(line + b"\n")
+    await client.writer.drain()
+    return json.loads(await client.reader.readline())
+
+
+#Клиент возвращает полученные кубиты — после обратного спина они в |0⟩
+def test_issued_token_verifies():
+    async def test(server, client):
+        token = await client.issue(8)
+        response = await client.verify(token["token_id"], token["qubits"], 1000, 50)
+        assert response["ok"] is True
+        assert response["batch_size"] == 1
+    run_with_server(test)
+
+
+#Подделка без ключей: кубиты в |0⟩ вместо выданных
+def test_forged_token_fails():
+    async def test(server, client):
+        token = await client.issue(32)
+        forged = [{"id": qbit["id"], "gates": []} for qbit in token["qubits"]]
+        assert (await client.verify(token["token_id"], forged, 1000, 50))["ok"] is False
+    run_with_server(test)
+
+
+def test_partial_and_duplicate_qubit_sets_rejected():
+    async def test(server, client):
+        token = await client.issue(4)
+        qubits = token["qubits"]
+        for sent in ([], qubits[:1], qubits[:3] + qubits[:1]):
+            assert "ValueError" in (await client.verify(token["token_id"], sent, 100, 5))["error"]
+    run_with_server(test)
+
+
+def test_bad_requests_get_error_replies_and_keep_connection():
+    async def test(server, client):
+        assert "error" in await raw(client, b"{bad")
+        assert "error" in await raw(client, b"[1]")
+        assert "OverflowError" in (await client.request("issue", qubits=1e400))["error"]
+        assert "ValueError" in (await client.issue(10 ** 9))["error"]
+        assert "KeyError" in (await client.verify(12345, [], 100, 5))["error"]
+        assert (await client.request("stats"))["errors"] == 5
+    run_with_server(test, max_qubits=64)
+
+
+def test_overlong_line_closes_connection():
+    async def test(server, client):
+        response = await raw(client, b'{"op": "stats", "pad": "' + b"x" * 4096 + b'"}')
+        assert "ValueError" in response["error"]
+        assert await client.reader.readline() == b""
+    run_with_server(test, max_line=1024)
+
+
+#Запрос с ошибкой не мешает другим запросам того же микропакета
+def test_malformed_request_isolated_within_batch():
+    async def test(server, client):
+        token = await client.issue(4)
+        other = await TokenClient().connect(port=server._server.sockets[0].getsockname()[1])
+        try:
+            bad, good = await asyncio.gather(
+                client.request("verify", token_id=token["token_id"], qubits=token["qubits"], shots=100),
+                other.verify(token["token_id"], token["qubits"], 100, 5),
+            )
+        finally:
+            await other.close()
+        assert "KeyError" in bad["error"]
+        assert good["batch_size"] == 2
+        assert "error" not in good
+    run_with_server(test, window=0.05)
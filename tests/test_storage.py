@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+
+from qubits.batch import KeyBatch
+from qubits.gates import state_of
+from qubits.noise import NoiseModel, NoisyEngine
+from qubits.qubit_func import (
+    Token, generate_random_private_qbits, make_public_qbits_array, make_spin_for_all_qbits_in_token,
+    reverse_qbits_in_token,
+)
+from qubits.storage import (
+    HEADER, HEADER_SIZE, KIND_TOKENS, MAGIC, RECORD_DTYPE_V2, TokenStore, save_keys, save_tokens,
+)
+
+
+#Токен после спина по своим ключам
+def make_token(token_id, keys, ttl=3600):
+    token = Token(token_id, make_public_qbits_array(keys), ttl=ttl)
+    make_spin_for_all_qbits_in_token(token, keys)
+    return token
+
+
+def test_keys_round_trip(tmp_path):
+    keys = KeyBatch([1, 2, 3], [10.0, 20.0, 30.0], [40.0, 50.0, 60.0])
+    save_keys(tmp_path / "keys.qtk", keys, token_id=7)
+    with TokenStore(tmp_path / "keys.qtk") as store:
+        assert store.sorted
+        assert store.token_ids() == [7]
+        loaded = store.key_batch(7)
+        assert loaded.ids.tolist() == [1, 2, 3]
+        assert loaded.theta.tolist() == [10.0, 20.0, 30.0]
+        assert loaded.phi.tolist() == [40.0, 50.0, 60.0]
+
+
+def test_tokens_round_trip(tmp_path):
+    keys = generate_random_private_qbits(4)
+    tokens = [make_token(1, keys), make_token(2, keys, ttl=math.inf)]
+    save_tokens(tmp_path / "tokens.qtk", tokens)
+    with TokenStore(tmp_path / "tokens.qtk") as store:
+        for token in tokens:
+            for batch in (False, True):
+                loaded = store.token(token.id, batch=batch)
+                assert loaded.ttl == token.ttl
+                assert [q.id for q in loaded.array_of_public_qbits] == [q.id for q in token.array_of_public_qbits]
+            expected = [np.abs(state_of(q.gates)) ** 2 for q in token.array_of_public_qbits]
+            assert np.allclose(abs(store.token_batch(token.id).state) ** 2, expected)
+
+
+#Записи, полученные до close(), остаются читаемыми: отображение держат они сами
+def test_records_readable_after_close(tmp_path):
+    save_keys(tmp_path / "keys.qtk", KeyBatch([1, 2], [10.0, 20.0], [30.0, 40.0]), token_id=1)
+    store = TokenStore(tmp_path / "keys.qtk")
+    records = store.records_for(1)
+    record = store.find(1, 2)
+    keys = store.key_batch(1)
+    store.close()
+    assert len(store) == 0
+    assert records[:1]["theta"].tolist() == [10.0]
+    assert float(record["phi"]) == 40.0
+    assert keys.theta.tolist() == [10.0, 20.0]
+
+
+#Спин и обратный спин сворачиваются в пустую схему, но depth = 4 должен пережить сохранение:
+#от него зависит число шумных слоёв
+def test_depth_round_trip_keeps_noisy_result(tmp_path):
+    keys = generate_random_private_qbits(3)
+    token = make_token(1, keys)
+    reverse_qbits_in_token(token, keys)
+    save_tokens(tmp_path / "tokens.qtk", [token])
+    engine = NoisyEngine(NoiseModel(depolarizing=0.05, amplitude_damping=0.05))
+    expected = engine.probabilities_of_one(token.array_of_public_qbits)
+    with TokenStore(tmp_path / "tokens.qtk") as store:
+        for batch in (False, True):
+            qbits = store.token(1, batch=batch).array_of_public_qbits
+            assert [q.depth for q in qbits] == [4, 4, 4]
+            assert np.allclose(engine.probabilities_of_one(qbits), expected)
+
+
+#Файл версии 2: записи без depth, кубиты получают depth по сохранённым вентилям
+def test_reads_version_2_records(tmp_path):
+    records = np.zeros(2, dtype=RECORD_DTYPE_V2)
+    records["token_id"] = 5
+    records["id"] = [1, 2]
+    records["ttl"] = 60
+    path = tmp_path / "v2.qtk"
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 2, KIND_TOKENS, 0, len(records), HEADER_SIZE, 0, 0).ljust(HEADER_SIZE, b"\0"))
+        f.write(records.tobytes())
+    with TokenStore(path) as store:
+        token = store.token(5)
+        assert token.ttl == 60
+        assert [q.depth for q in token.array_of_public_qbits] == [0, 0]
+        assert store.token_batch(5).depth.tolist() == [0, 0]
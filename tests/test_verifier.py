@@ -0,0 +1,65 @@
+import math
+import time
+
+import pytest
+
+from qubits.batch import TokenBatch
+from qubits.qubit_func import (
+    Token, generate_random_private_qbits, make_public_qbits_array, make_spin_for_all_qbits_in_token,
+    reverse_qbits_in_token,
+)
+from qubits.verifier import TokenVerifier
+
+
+#Честный токен после спина и обратного спина; кубиты с id из forged переводятся в |1⟩
+def make_token(token_id, qubits, forged=(), ttl=math.inf):
+    keys = generate_random_private_qbits(qubits)
+    token = Token(token_id, make_public_qbits_array(keys), ttl=ttl)
+    make_spin_for_all_qbits_in_token(token, keys)
+    reverse_qbits_in_token(token, keys)
+    for qbit in token.array_of_public_qbits:
+        if qbit.id in forged:
+            qbit.append_gates([("RY", math.pi)])
+    return token
+
+
+@pytest.fixture(scope="module")
+def verifier():
+    with TokenVerifier(workers=2, engine="analytic", chunk_size=4) as verifier:
+        yield verifier
+
+
+def test_honest_and_forged_tokens(verifier):
+    tokens = [make_token(1, 16), make_token(2, 16, forged={11}), make_token(3, 3)]
+    results = [result for _, result in verifier.verify_many(tokens, 200, 20)]
+    assert results == [True, False, True]
+
+
+def test_unordered_results_match_tokens(verifier):
+    tokens = [make_token(i, 8, forged={1} if i % 2 else ()) for i in range(1, 9)]
+    results = dict((token.id, result) for token, result in verifier.verify_many(tokens, 200, 20, ordered=False))
+    assert results == {i: i % 2 == 0 for i in range(1, 9)}
+
+
+def test_batch_tokens_are_chunked(verifier):
+    token = make_token(1, 10)
+    batch_token = Token(1, TokenBatch.from_qbits(token.array_of_public_qbits), ttl=math.inf)
+    assert verifier.submit(batch_token, 200, 20).result() is True
+
+
+def test_expired_and_empty_tokens_settle_at_once(verifier):
+    expired = make_token(1, 4, ttl=0.0)
+    time.sleep(0.01)
+    assert verifier.submit(expired, 200, 20).result() is False
+    assert verifier.submit(Token(2, [], ttl=math.inf), 200, 20).result() is True
+
+
+#Отмена токена отменяет его куски; после завершения всех кусков ожидающих не остаётся
+def test_cancel_clears_pending():
+    with TokenVerifier(workers=1, engine="analytic", chunk_size=1) as verifier:
+        futures = [verifier.submit(make_token(i, 16), 100, 10) for i in range(1, 20)]
+        verifier.cancel()
+        for future in futures:
+            assert future.cancelled() or future.result() is True
+        assert any(future.cancelled() for future in futures)
+    assert not verifier._pending